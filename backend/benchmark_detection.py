@@ -0,0 +1,257 @@
+"""
+Benchmark the pill detection path on synthetic pill images
+
+Images of several sizes and pill densities are generated deterministically and
+run through PillDetectionService sequentially, concurrently (through the
+micro-batching InferenceScheduler, as the API does) and in explicit batches.
+Each mode runs in a fresh process, so its peak RSS is its own. The report has
+images/sec, p50/p95/p99 latency and peak RSS per mode, and can be saved as
+JSON and compared against an earlier run.
+
+Usage:
+    python benchmark_detection.py --json after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from services.detection_cache import DetectionCache
+from services.inference_backends import INFERENCE_BACKEND, MODEL_PATH, MODEL_PRECISION, create_backend
+from services.inference_scheduler import InferenceScheduler
+from services.pill_detection_service import PillDetectionService
+
+DEFAULT_SIZES = ["640x480", "1280x960", "4032x3024"]
+DEFAULT_DENSITIES = [10, 50, 150]
+
+def generate_pill_image(width: int, height: int, pills: int, seed: int = 0) -> bytes:
+    """JPEG of a tray with the given number of randomly placed, shaded pills"""
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), rng.integers(170, 230), dtype=np.uint8)
+    image = cv2.add(image, rng.integers(0, 12, (height, width, 3), dtype=np.uint8))
+
+    radius = max(4, int(min(width, height) / (2.5 * np.sqrt(pills + 1))))
+    for _ in range(pills):
+        center = (int(rng.integers(radius, width - radius)), int(rng.integers(radius, height - radius)))
+        axes = (radius, int(radius * rng.uniform(0.5, 0.9)))
+        color = tuple(int(c) for c in rng.integers(30, 255, 3))
+        cv2.ellipse(image, center, axes, float(rng.uniform(0, 180)), 0, 360, color, -1, cv2.LINE_AA)
+        cv2.ellipse(image, center, axes, 0, 0, 360, (40, 40, 40), 1, cv2.LINE_AA)
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("Could not encode synthetic image")
+    return encoded.tobytes()
+
+def generate_images(sizes: List[str], densities: List[int], per_combination: int) -> List[Dict[str, Any]]:
+    """Synthetic uploads for every size and density combination"""
+    images = []
+    for size in sizes:
+        width, height = (int(value) for value in size.lower().split("x"))
+        for pills in densities:
+            for index in range(per_combination):
+                images.append({
+                    "size": size,
+                    "pills": pills,
+                    "data": generate_pill_image(width, height, pills, seed=len(images))
+                })
+    return images
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far, in MB (None where unsupported); it never goes down"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def summarize(latencies_ms: List[float], images: int, elapsed: float) -> Dict[str, Any]:
+    return {
+        "images": images,
+        "elapsed_s": elapsed,
+        "images_per_sec": images / elapsed if elapsed > 0 else 0.0,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "latency_mean_ms": float(np.mean(latencies_ms)),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def run_sequential(service: PillDetectionService, images: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One detect_pills call at a time, with median latency broken down by image size and density"""
+    latencies = []
+    start = time.perf_counter()
+    for image in images:
+        call_start = time.perf_counter()
+        service.detect_pills(image["data"])
+        latencies.append((time.perf_counter() - call_start) * 1000)
+    result = summarize(latencies, len(images), time.perf_counter() - start)
+
+    groups: Dict[str, List[float]] = {}
+    for image, latency in zip(images, latencies):
+        groups.setdefault(f"{image['size']}/{image['pills']} pills", []).append(latency)
+    result["latency_p50_ms_by_image"] = {group: float(np.median(values)) for group, values in groups.items()}
+    return result
+
+def run_concurrent(service: PillDetectionService, uploads: List[bytes], concurrency: int, workers: int) -> Dict[str, Any]:
+    """Concurrent clients submitting through the micro-batching scheduler, like /upload"""
+    async def client(scheduler: InferenceScheduler, queue: List[bytes], latencies: List[float]):
+        while queue:
+            data = queue.pop()
+            call_start = time.perf_counter()
+            await scheduler.submit(data)
+            latencies.append((time.perf_counter() - call_start) * 1000)
+
+    async def run() -> Dict[str, Any]:
+        scheduler = InferenceScheduler(
+            lambda images: service.detect_pills_batch(images, compact=True),
+            max_workers=workers,
+            max_queue_size=max(len(uploads), 1),
+            timeout_seconds=3600
+        )
+        queue, latencies = list(reversed(uploads)), []
+        start = time.perf_counter()
+        await asyncio.gather(*[client(scheduler, queue, latencies) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+        await scheduler.shutdown()
+        scheduler.executor.shutdown()
+        return summarize(latencies, len(uploads), elapsed)
+
+    return asyncio.run(run())
+
+def run_batched(service: PillDetectionService, uploads: List[bytes], batch_size: int) -> Dict[str, Any]:
+    """detect_pills_batch on fixed-size batches; latency is per batch"""
+    latencies = []
+    start = time.perf_counter()
+    for offset in range(0, len(uploads), batch_size):
+        call_start = time.perf_counter()
+        service.detect_pills_batch(uploads[offset:offset + batch_size], compact=True)
+        latencies.append((time.perf_counter() - call_start) * 1000)
+    result = summarize(latencies, len(uploads), time.perf_counter() - start)
+    result["batch_size"] = batch_size
+    return result
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_mode(args: argparse.Namespace, mode: str, images: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Load and warm up the model, then time one mode; meant to run in a process of its own"""
+    uploads = [image["data"] for image in images]
+
+    service = PillDetectionService(create_backend(args.backend, args.model, args.precision))
+    # Every call must run the model, so results are never cached
+    service.result_cache = DetectionCache(max_entries=0, db_path=None)
+    service.warm_up()
+    setup_rss = peak_rss_mb()
+
+    modes: Dict[str, Callable[[], Dict[str, Any]]] = {
+        "sequential": lambda: run_sequential(service, images),
+        "concurrent": lambda: run_concurrent(service, uploads, args.concurrency, args.workers),
+        "batched": lambda: run_batched(service, uploads, args.batch_size),
+    }
+    result = modes[mode]()
+    # Images and the warm model alone; peak_rss_mb minus this is what the mode itself added
+    result["setup_peak_rss_mb"] = setup_rss
+    return result
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Generate the images, then time every mode in a fresh process"""
+    images = generate_images(args.sizes, args.densities, args.per_combination) * args.repeat
+
+    # ru_maxrss only ever grows, so in one shared process each mode's peak would include
+    # image generation and every mode before it
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for mode in args.modes:
+        print(f"Running {mode} benchmark on {len(images)} images...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[mode] = executor.submit(run_mode, args, mode, images).result()
+
+    return {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "backend": args.backend,
+            "model": args.model,
+            "precision": args.precision,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "sizes": args.sizes,
+            "densities": args.densities,
+            "images": len(images),
+            "concurrency": args.concurrency,
+            "workers": args.workers
+        },
+        "results": results
+    }
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """Print one line per mode, with the change from the baseline run if given"""
+    metrics = [
+        ("images_per_sec", "img/s"), ("latency_p50_ms", "p50 ms"), ("latency_p95_ms", "p95 ms"),
+        ("latency_p99_ms", "p99 ms"), ("peak_rss_mb", "RSS MB"),
+    ]
+    print(f"{'Mode':12}" + "".join(f"{label:>12}" for _, label in metrics))
+    for mode, result in report["results"].items():
+        row = f"{mode:12}"
+        for key, _ in metrics:
+            value = result.get(key)
+            row += f"{value:>12.1f}" if value is not None else f"{'n/a':>12}"
+        print(row)
+
+        previous = (baseline or {}).get("results", {}).get(mode)
+        if previous:
+            deltas = f"{'  vs base':12}"
+            for key, _ in metrics:
+                if result.get(key) is not None and previous.get(key):
+                    deltas += f"{(result[key] / previous[key] - 1):>+12.1%}"
+                else:
+                    deltas += f"{'':>12}"
+            print(deltas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pill detection throughput and latency")
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, help="torch, onnx or openvino")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model weights")
+    parser.add_argument("--precision", default=MODEL_PRECISION, help="fp32 or int8 (onnx only)")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Image sizes as WIDTHxHEIGHT")
+    parser.add_argument("--densities", nargs="+", type=int, default=DEFAULT_DENSITIES, help="Pills per image")
+    parser.add_argument("--per-combination", type=int, default=2, help="Images per size and density")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each image is run per mode")
+    parser.add_argument("--modes", nargs="+", default=["sequential", "concurrent", "batched"],
+                        choices=["sequential", "concurrent", "batched"])
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients in concurrent mode")
+    parser.add_argument("--workers", type=int, default=1, help="Inference workers in concurrent mode")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per call in batched mode")
+    parser.add_argument("--json", help="Write the full report to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    report = run_benchmark(args)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as report_file:
+            json.dump(report, report_file, indent=2)
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, ForeignKey, Boolean
+from typing import List
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, ForeignKey, Boolean, Index, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database.database import Base
@@ -14,6 +16,20 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    token_hash = Column(String, unique=True, index=True)  # SHA-256 of the token; the token itself is never stored
+    family_id = Column(String, index=True)  # shared by every token rotated from the same login
+    expires_at = Column(DateTime)
+    revoked = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    user = relationship("User")
+
 class Patient(Base):
     __tablename__ = "patients"
     
@@ -41,6 +57,13 @@ class Supplement(Base):
 
 class Record(Base):
     __tablename__ = "records"
+    # /records filters by patient or supplement and orders by newest first. The composite
+    # indexes serve both the filter and the order (and lookups on their first column alone);
+    # the timestamp index serves unfiltered listings and date ranges.
+    __table_args__ = (
+        Index("ix_records_patient_id_timestamp", "patient_id", "timestamp"),
+        Index("ix_records_supplement_id_timestamp", "supplement_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("patients.id"))
@@ -48,9 +71,31 @@ class Record(Base):
     pill_count = Column(Integer)
     source = Column(String)  # "ai" or "manual"
     confidence = Column(Float, nullable=True)  # AI confidence score
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     notes = Column(Text, nullable=True)
     
     # Relationships
     patient = relationship("Patient", back_populates="records")
     supplement = relationship("Supplement", back_populates="records")
+
+def create_missing_indexes(engine: Engine) -> List[str]:
+    """
+    Create declared indexes missing from an existing database
+    
+    create_all only creates whole tables, so databases made before an index
+    was declared never get it. Safe to run at every startup; returns the
+    names of the indexes it created.
+    """
+    inspector = inspect(engine)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine, checkfirst=True)
+                created.append(index.name)
+    if created and engine.dialect.name == "sqlite":
+        # Refresh the statistics SQLite's planner uses to choose between indexes
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+    return created
@@ -0,0 +1,108 @@
+"""
+Compare FP32 and INT8 pill detection models on a labeled image folder
+
+The folder must contain the images and a labels.csv with a header row
+"filename,pill_count". Accuracy uses the model's raw detection count, since
+the demo count returned by the API adds simulated variation.
+
+Usage:
+    python evaluate_quantization.py path/to/labeled_images --model yolov8n.pt --json report.json
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from services.inference_backends import create_backend
+from services.pill_detection_service import PillDetectionService
+
+def load_labeled_images(folder: str) -> List[Tuple[str, np.ndarray, int]]:
+    """Read (filename, image, expected count) for every labeled image in folder"""
+    samples = []
+    with open(os.path.join(folder, "labels.csv"), newline="") as labels_file:
+        for row in csv.DictReader(labels_file):
+            image = cv2.imread(os.path.join(folder, row["filename"]))
+            if image is None:
+                print(f"Skipping unreadable image: {row['filename']}")
+                continue
+            samples.append((row["filename"], image, int(row["pill_count"])))
+    return samples
+
+def evaluate_model(service: PillDetectionService, samples: List[Tuple[str, np.ndarray, int]], warmup: int = 3) -> Dict[str, Any]:
+    """Run every sample through the service one at a time and collect per-image results"""
+    # Warm-up runs are not timed
+    for _, image, _ in samples[:warmup]:
+        service.detect_pills(image)
+
+    latencies, counts, confidences = [], [], []
+    for _, image, _ in samples:
+        start = time.perf_counter()
+        # Decoded arrays bypass the result cache, so every call runs the model
+        result = service.detect_pills(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+        counts.append(result["raw_detections"])
+        confidences.append(result["confidence"])
+
+    expected = np.array([count for _, _, count in samples])
+    counts = np.array(counts)
+    return {
+        "counts": counts.tolist(),
+        "confidences": confidences,
+        "count_accuracy": float(np.mean(counts == expected)),
+        "mean_absolute_count_error": float(np.mean(np.abs(counts - expected))),
+        "mean_confidence": float(np.mean(confidences)),
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p95_ms": float(np.percentile(latencies, 95))
+    }
+
+def compare_models(folder: str, model_path: str) -> Dict[str, Any]:
+    """Evaluate the FP32 and INT8 ONNX models on the same labeled images"""
+    samples = load_labeled_images(folder)
+    if not samples:
+        raise ValueError(f"No labeled images found in {folder}")
+
+    fp32 = evaluate_model(PillDetectionService(create_backend("onnx", model_path, "fp32")), samples)
+    int8 = evaluate_model(PillDetectionService(create_backend("onnx", model_path, "int8")), samples)
+
+    return {
+        "images": len(samples),
+        "fp32": fp32,
+        "int8": int8,
+        "mean_confidence_delta": float(np.mean(np.array(int8["confidences"]) - np.array(fp32["confidences"]))),
+        "count_agreement": float(np.mean(np.array(int8["counts"]) == np.array(fp32["counts"]))),
+        "p50_speedup": fp32["latency_p50_ms"] / int8["latency_p50_ms"] if int8["latency_p50_ms"] > 0 else 0.0
+    }
+
+def print_report(report: Dict[str, Any]):
+    """Print a side-by-side summary of the comparison"""
+    print(f"Images evaluated: {report['images']}")
+    print(f"{'':28}{'FP32':>12}{'INT8':>12}")
+    for key, label in [
+        ("count_accuracy", "Count accuracy"),
+        ("mean_absolute_count_error", "Mean abs count error"),
+        ("mean_confidence", "Mean confidence"),
+        ("latency_p50_ms", "Latency p50 (ms)"),
+        ("latency_p95_ms", "Latency p95 (ms)"),
+    ]:
+        print(f"{label:28}{report['fp32'][key]:>12.3f}{report['int8'][key]:>12.3f}")
+    print(f"Mean confidence delta (INT8 - FP32): {report['mean_confidence_delta']:+.4f}")
+    print(f"Count agreement: {report['count_agreement']:.1%}")
+    print(f"p50 speedup: {report['p50_speedup']:.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FP32 and INT8 pill detection models")
+    parser.add_argument("folder", help="Folder with images and labels.csv (filename,pill_count)")
+    parser.add_argument("--model", default="yolov8n.pt", help="FP32 .pt or .onnx model")
+    parser.add_argument("--json", help="Write the full report to this JSON file")
+    args = parser.parse_args()
+
+    report = compare_models(args.folder, args.model)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as report_file:
+            json.dump(report, report_file, indent=2)
@@ -1,11 +1,13 @@
 from sqlalchemy.orm import Session
 from database.database import SessionLocal, engine
-from database.models import Base, User, Patient, Supplement
+from database.models import Base, User, Patient, Supplement, create_missing_indexes
 from services.auth_service import AuthService
 import json
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+# Databases created before an index was declared get it here
+create_missing_indexes(engine)
 
 def init_db():
     """Initialize database with sample data"""
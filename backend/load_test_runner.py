@@ -0,0 +1,271 @@
+"""
+Load test the API end to end with mixed CHP traffic
+
+By default a scratch SQLite database is seeded with init_db.py and the app is
+started on it with uvicorn. Virtual users then log in and loop over scan,
+upload, submit, records, export and login requests in the configured mix.
+The report has per-endpoint throughput, error counts and p50/p95/p99 latency.
+
+Usage:
+    python load_test_runner.py --concurrency 20 --duration 60 --json load.json
+    python load_test_runner.py --base-url http://staging:8000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmark_detection import generate_pill_image, git_commit
+
+# Accounts and barcodes created by init_db.py
+SEEDED_USERS = [("chp1@mms.org", "password123"), ("chp2@mms.org", "password123")]
+SEEDED_BARCODES = [f"{kind}{number:03d}" for number in range(1, 6) for kind in ("IRON", "FOLIC")]
+
+# Relative frequency of each action: CHPs scan, photograph and submit far more than they export
+DEFAULT_MIX = "scan=4,upload=3,submit=3,records=2,export=1,login=1"
+
+@contextmanager
+def local_server(port: int, workers: int, startup_timeout: float) -> Iterator[str]:
+    """Seed a scratch database, serve main.app on it and yield the base URL"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'load_test.db')}")
+        subprocess.run([sys.executable, "init_db.py"], cwd=backend_dir, env=env, check=True, stdout=subprocess.DEVNULL)
+
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=backend_dir,
+            env=env
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_until_ready(base_url, startup_timeout, server)
+            yield base_url
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+def wait_until_ready(base_url: str, timeout: float, server: Optional[subprocess.Popen] = None):
+    """Poll /ready until the model is warm, so warm-up is not counted as request latency"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} was not ready within {timeout}s")
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        action, _, weight = item.partition("=")
+        if action.strip() not in VirtualUser.ACTIONS:
+            raise ValueError(f"Unknown action '{action}', expected one of: {', '.join(VirtualUser.ACTIONS)}")
+        weights[action.strip()] = float(weight or 1)
+    return weights
+
+class VirtualUser:
+    """One simulated CHP: logs in, then repeatedly picks an action from the traffic mix"""
+
+    ACTIONS = ("scan", "upload", "submit", "records", "export", "login")
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        index: int,
+        images: List[bytes],
+        latencies: Dict[str, List[float]],
+        errors: Dict[str, int],
+        unique_uploads: bool
+    ):
+        self.client = client
+        self.email, self.password = SEEDED_USERS[index % len(SEEDED_USERS)]
+        self.images = images
+        self.latencies = latencies
+        self.errors = errors
+        self.unique_uploads = unique_uploads
+        self.rng = random.Random(index)
+        self.headers: Dict[str, str] = {}
+        self.scanned: Optional[Dict[str, Any]] = None
+        self.last_count: Optional[int] = None
+
+    async def run(self, deadline: float, mix: Dict[str, float], think_time: float):
+        await self.login()
+        actions, weights = list(mix), list(mix.values())
+        while time.monotonic() < deadline:
+            await getattr(self, self.rng.choices(actions, weights)[0])()
+            if think_time > 0:
+                await asyncio.sleep(self.rng.expovariate(1 / think_time))
+
+    async def _request(self, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Send one request and record its latency and outcome under name"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        if response is None or response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        return response
+
+    async def login(self):
+        response = await self._request("login", "POST", "/login", json={"email": self.email, "password": self.password})
+        if response is not None:
+            self.headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+    async def scan(self):
+        response = await self._request("scan", "POST", "/scan", data={"barcode_id": self.rng.choice(SEEDED_BARCODES)})
+        if response is not None:
+            self.scanned = response.json()
+
+    async def upload(self):
+        image = self.rng.choice(self.images)
+        if self.unique_uploads:
+            # Bytes after the JPEG end marker are ignored by decoders but defeat the result cache
+            image += self.rng.randbytes(16)
+        response = await self._request("upload", "POST", "/upload", files={"file": ("pills.jpg", image, "image/jpeg")})
+        if response is not None:
+            self.last_count = response.json()["pill_count"]
+
+    async def submit(self):
+        if self.scanned is None:
+            await self.scan()
+            if self.scanned is None:
+                return
+        await self._request("submit", "POST", "/submit", json={
+            "patient_id": self.scanned["patient_id"],
+            "supplement_id": self.scanned["supplement_id"],
+            "pill_count": self.last_count if self.last_count is not None else self.rng.randint(0, 30),
+            "source": "ai" if self.last_count is not None else "manual",
+            "confidence": 0.8 if self.last_count is not None else None
+        })
+
+    async def records(self):
+        params = {"patient_id": self.scanned["patient_id"]} if self.scanned else {}
+        await self._request("records", "GET", "/records", params=params)
+
+    async def export(self):
+        await self._request("export", "GET", "/export/csv")
+
+async def run_load(
+    base_url: str,
+    concurrency: int,
+    duration: float,
+    mix: Dict[str, float],
+    images: List[bytes],
+    think_time: float,
+    unique_uploads: bool
+) -> Dict[str, Any]:
+    """Run the virtual users for duration seconds and summarize per endpoint"""
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        users = [VirtualUser(client, index, images, latencies, errors, unique_uploads) for index in range(concurrency)]
+        start = time.monotonic()
+        await asyncio.gather(*[user.run(start + duration, mix, think_time) for user in users])
+        elapsed = time.monotonic() - start
+
+    endpoints = {
+        name: summarize_endpoint(values, errors.get(name, 0), elapsed)
+        for name, values in sorted(latencies.items())
+    }
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    return {
+        "elapsed_s": elapsed,
+        "total": summarize_endpoint(all_latencies, sum(errors.values()), elapsed),
+        "endpoints": endpoints
+    }
+
+def summarize_endpoint(latencies_ms: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "requests_per_sec": len(latencies_ms) / elapsed if elapsed > 0 else 0.0,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "latency_max_ms": float(np.max(latencies_ms))
+    }
+
+def print_report(report: Dict[str, Any]):
+    columns = [
+        ("requests", "reqs", "d"), ("errors", "errors", "d"), ("requests_per_sec", "req/s", ".1f"),
+        ("latency_p50_ms", "p50 ms", ".1f"), ("latency_p95_ms", "p95 ms", ".1f"),
+        ("latency_p99_ms", "p99 ms", ".1f"), ("latency_max_ms", "max ms", ".1f"),
+    ]
+    print(f"{'Endpoint':10}" + "".join(f"{label:>10}" for _, label, _ in columns))
+    rows = list(report["results"]["endpoints"].items()) + [("TOTAL", report["results"]["total"])]
+    for name, stats in rows:
+        print(f"{name:10}" + "".join(f"{stats[key]:>10{spec}}" for key, _, spec in columns))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end API load test with mixed CHP traffic")
+    parser.add_argument("--base-url", help="Test an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the local server")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn worker processes for the local server")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for the model to warm up")
+    parser.add_argument("--concurrency", type=int, default=10, help="Simultaneous virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of traffic")
+    parser.add_argument("--think-time", type=float, default=0, help="Mean pause between a user's requests, in seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Action weights, e.g. scan=4,upload=3")
+    parser.add_argument("--image-size", default="1280x960", help="Synthetic upload size as WIDTHxHEIGHT")
+    parser.add_argument("--images", type=int, default=8, help="Distinct synthetic upload images")
+    parser.add_argument("--allow-cache-hits", action="store_true", help="Repeat identical uploads so the result cache can serve them")
+    parser.add_argument("--json", help="Write the full report to this JSON file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    width, height = (int(value) for value in args.image_size.lower().split("x"))
+    images = [generate_pill_image(width, height, pills=10 + 10 * index, seed=index) for index in range(args.images)]
+
+    def run(base_url: str) -> Dict[str, Any]:
+        print(f"Running {args.concurrency} users for {args.duration:.0f}s against {base_url}...")
+        return asyncio.run(run_load(
+            base_url, args.concurrency, args.duration, mix, images, args.think_time, not args.allow_cache_hits
+        ))
+
+    if args.base_url:
+        wait_until_ready(args.base_url, args.startup_timeout)
+        results = run(args.base_url)
+    else:
+        with local_server(args.port, args.server_workers, args.startup_timeout) as base_url:
+            results = run(base_url)
+
+    report = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "base_url": args.base_url or "local",
+            "server_workers": args.server_workers,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "think_time_s": args.think_time,
+            "mix": mix,
+            "image_size": args.image_size
+        },
+        "results": results
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as report_file:
+            json.dump(report, report_file, indent=2)
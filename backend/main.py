@@ -1,24 +1,51 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 import uvicorn
+import asyncio
 import os
 import json
+import logging
+import time
 from datetime import datetime
 from typing import List, Optional
 
 from database.database import get_db, engine
-from database.models import Base, User, Patient, Supplement, Record
+from database.models import Base, User, Patient, Supplement, Record, create_missing_indexes
 from services.auth_service import AuthService
 from services.pill_detection_service import PillDetectionService
+from services.inference_scheduler import (
+    InferenceQueueFullError, InferenceTimeoutError, INFERENCE_POOL, INFERENCE_WORKERS,
+    create_inference_executor
+)
+from services.image_preprocessing import make_preview_image
+from services.metrics import (
+    REGISTRY, UPLOAD_STAGE_DURATION, MetricsMiddleware, instrument_engine, record_upload_stages
+)
+from services.model_registry import (
+    DETECTION_MODELS, DisallowedWeightsError, ModelRegistry, RegisteredModel, UnknownQualityError, parse_model_config
+)
+from services.pagination import RECORDS_MAX_PAGE_SIZE, RECORDS_PAGE_SIZE, InvalidCursorError, keyset_page
+from services.profiling import CONTINUOUS_PROFILING, ContinuousProfiler, ProfilingMiddleware, profile_store
+from services.thread_tuning import apply_thread_settings, resolve_thread_settings
 from schemas.schemas import (
-    UserLogin, UserResponse, RecordCreate, RecordResponse,
-    PatientResponse, SupplementResponse, PillCountResult
+    UserLogin, UserResponse, TokenRefreshRequest, TokenRefreshResponse, RecordCreate, RecordResponse,
+    PatientResponse, SupplementResponse, PillCountResult,
+    DetectionModelInfo, ModelSwapRequest, ProfileSummary, ProfileArmRequest
 )
 
+logger = logging.getLogger(__name__)
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
+# Databases created before an index was declared get it here
+create_missing_indexes(engine)
+
+# Time every SQL statement for /metrics
+instrument_engine(engine)
 
 app = FastAPI(title="MMS Pill Counting API", version="1.0.0")
 
@@ -29,33 +56,130 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-route request counts and latency histograms, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in sampling profiles of live requests (X-Profile header or /admin/profiles/arm)
+app.add_middleware(ProfilingMiddleware)
+continuous_profiler = ContinuousProfiler() if CONTINUOUS_PROFILING else None
+
 # Security
 security = HTTPBearer()
 auth_service = AuthService()
-pill_detection_service = PillDetectionService()
+
+# Inference runs in a worker pool so the event loop stays free for other requests.
+# Each quality level (e.g. a nano model for previews, a larger one for final counts)
+# has its own micro-batching scheduler and concurrency cap on the shared pool.
+# Workers return compact results, expanded per request in build_pill_count_result.
+detection_models = parse_model_config(DETECTION_MODELS)
+
+# Worker and thread counts are sized to this process's share of the CPU (or auto-tuned)
+# so several workers, or several uvicorn processes, do not oversubscribe the cores
+thread_settings = resolve_thread_settings(INFERENCE_POOL, INFERENCE_WORKERS, next(iter(detection_models.values())))
+apply_thread_settings(thread_settings)
+model_registry = ModelRegistry(
+    detection_models,
+    executor=create_inference_executor(workers=thread_settings.workers, thread_settings=thread_settings),
+    workers=thread_settings.workers
+)
+
+# The default model serves requests that do not ask for a quality
+pill_detection_service = model_registry.get().service
+inference_scheduler = model_registry.get().scheduler
+
+def get_detection_model(quality: Optional[str]) -> RegisteredModel:
+    """Model for the requested quality level, as a 400 error if none is configured"""
+    try:
+        return model_registry.get(quality)
+    except UnknownQualityError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def current_user(
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> User:
+    """
+    Authenticated user for the request, as a 401 error for a bad token
+    
+    Handlers that also depend on get_db receive this same session. Decoded
+    tokens and resolved users are cached in auth_service, so usually no query
+    runs here and the (lazily connecting) session never touches the database.
+    """
+    user = auth_service.get_current_user(db, credentials.credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if not user.is_active:
+        raise HTTPException(status_code=403, detail="Inactive user")
+    return user
+
+async def admin_user(user: User = Depends(current_user)) -> User:
+    """Authenticated admin for the request, as a 403 error for other roles"""
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+def build_pill_count_result(result: dict, image_path: str, compact: bool) -> PillCountResult:
+    """Build the upload response from a compact detection result"""
+    if compact:
+        return PillCountResult(
+            pill_count=result["count"],
+            confidence=result["confidence"],
+            image_path=image_path,
+            boxes=result["boxes"],
+            confidences=result["confidences"],
+            class_ids=result["class_ids"]
+        )
+    return PillCountResult(
+        pill_count=result["count"],
+        confidence=result["confidence"],
+        bounding_boxes=PillDetectionService.expand_result(result)["bounding_boxes"],
+        image_path=image_path
+    )
+
+def sse_event(event: str, data: str) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {data}\n\n"
 
 @app.post("/login", response_model=UserResponse)
 async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     """Authenticate CHP user"""
-    user = auth_service.authenticate_user(db, user_credentials.email, user_credentials.password)
+    # bcrypt runs on the password hashing threads so login bursts do not stall other requests
+    user = await auth_service.authenticate_user_async(db, user_credentials.email, user_credentials.password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = auth_service.create_access_token(data={"sub": user.email})
-    return UserResponse(id=user.id, email=user.email, name=user.name, token=token)
+    refresh_token = auth_service.create_refresh_token(db, user)
+    return UserResponse(id=user.id, email=user.email, name=user.name, token=token, refresh_token=refresh_token)
+
+@app.post("/token/refresh", response_model=TokenRefreshResponse)
+async def refresh_access_token(refresh_request: TokenRefreshRequest, db: Session = Depends(get_db)):
+    """Issue a new access token and rotated refresh token, without re-entering the password"""
+    rotated = auth_service.rotate_refresh_token(db, refresh_request.refresh_token)
+    if rotated is None:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    user, refresh_token = rotated
+    return TokenRefreshResponse(
+        token=auth_service.create_access_token(data={"sub": user.email}),
+        refresh_token=refresh_token
+    )
+
+@app.post("/logout")
+async def logout(refresh_request: TokenRefreshRequest, db: Session = Depends(get_db)):
+    """Revoke the refresh token so the session cannot be extended"""
+    auth_service.revoke_refresh_token(db, refresh_request.refresh_token)
+    return {"status": "logged_out"}
 
 @app.get("/patients", response_model=List[PatientResponse])
 async def get_patients(
     db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user: User = Depends(current_user)
 ):
     """Get list of patients"""
-    user = auth_service.get_current_user(db, credentials.credentials)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
     patients = db.query(Patient).all()
     return [PatientResponse(id=p.id, name=p.name, patient_metadata=p.patient_metadata) for p in patients]
 
@@ -63,13 +187,9 @@ async def get_patients(
 async def scan_barcode(
     barcode_id: str = Form(...),
     db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user: User = Depends(current_user)
 ):
     """Scan supplement barcode and return patient info"""
-    user = auth_service.get_current_user(db, credentials.credentials)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
     supplement = db.query(Supplement).filter(Supplement.barcode_id == barcode_id).first()
     if not supplement:
         raise HTTPException(status_code=404, detail="Supplement not found")
@@ -82,51 +202,147 @@ async def scan_barcode(
         "patient_name": patient.name
     }
 
-@app.post("/upload", response_model=PillCountResult)
+@app.post("/upload", response_model=PillCountResult, response_model_exclude_none=True)
 async def upload_image(
+    request: Request,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    compact: bool = False,
+    quality: Optional[str] = None,
+    user: User = Depends(current_user)
 ):
-    """Upload pill bottle image and get AI count"""
-    user = auth_service.get_current_user(db, credentials.credentials)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
+    """Upload pill bottle image and get AI count (compact=true returns detections as arrays)"""
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Save uploaded image temporarily
-    temp_path = f"temp_{datetime.now().timestamp()}.jpg"
+    model = get_detection_model(quality)
+    
     try:
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Keep the upload in memory; it is decoded once inside the inference worker.
+        # Reading counts from the start of the request, so it includes receiving the body.
+        content = await file.read()
+        request_start = getattr(request.state, "request_start", None)
+        if request_start is not None:
+            UPLOAD_STAGE_DURATION.observe(time.perf_counter() - request_start, stage="read")
         
-        # Run YOLOv8 detection
-        result = pill_detection_service.detect_pills(temp_path)
+        # Run YOLOv8 detection, micro-batched with concurrent uploads (repeat uploads come from the cache)
+        start = time.perf_counter()
+        result = await model.detect(content)
+        record_upload_stages(result, time.perf_counter() - start)
         
-        return PillCountResult(
-            pill_count=result["count"],
-            confidence=result["confidence"],
-            bounding_boxes=result["bounding_boxes"],
-            image_path=temp_path
-        )
+        start = time.perf_counter()
+        response = build_pill_count_result(result, file.filename or "", compact)
+        UPLOAD_STAGE_DURATION.observe(time.perf_counter() - start, stage="response")
+        return response
     
+    except InferenceQueueFullError:
+        raise HTTPException(status_code=429, detail="Too many detection requests, please retry")
+    except InferenceTimeoutError:
+        raise HTTPException(status_code=504, detail="Detection timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+
+@app.post("/upload/batch", response_model=List[PillCountResult], response_model_exclude_none=True)
+async def upload_images_batch(
+    files: List[UploadFile] = File(...),
+    compact: bool = False,
+    quality: Optional[str] = None,
+    user: User = Depends(current_user)
+):
+    """Upload several pill bottle images and get AI counts from one batched inference"""
+    model = get_detection_model(quality)
+    if len(files) > model.service.max_batch_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {model.service.max_batch_size} images per batch"
+        )
+
+    for file in files:
+        if not file.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail="File must be an image")
+
+    try:
+        # Keep the uploads in memory; they are decoded once inside the inference worker
+        contents = [await file.read() for file in files]
+
+        # Run YOLOv8 detection on all images at once
+        results = await model.detect_batch(contents)
+
+        return [
+            build_pill_count_result(result, file.filename or "", compact)
+            for result, file in zip(results, files)
+        ]
+
+    except InferenceQueueFullError:
+        raise HTTPException(status_code=429, detail="Too many detection requests, please retry")
+    except InferenceTimeoutError:
+        raise HTTPException(status_code=504, detail="Detection timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
+@app.post("/upload/stream")
+async def upload_image_stream(
+    file: UploadFile = File(...),
+    compact: bool = False,
+    quality: Optional[str] = None,
+    user: User = Depends(current_user)
+):
+    """
+    Upload pill bottle image and stream the AI count as Server-Sent Events
+    
+    A "preview" event with a quick count from a downscaled image is sent first,
+    then a "result" event with the full count and bounding boxes (or an "error"
+    event), so CHPs on slow connections see a number before the full pass ends.
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    model = get_detection_model(quality)
+    preview_model = model_registry.get(model_registry.preview_quality)
+    # Without a lighter model or tiling, the full pass costs the same as a preview
+    send_preview = preview_model is not model or model.service.tiled_inference
+    
+    content = await file.read()
+    image_path = file.filename or ""
+    
+    async def events():
+        if send_preview:
+            try:
+                loop = asyncio.get_running_loop()
+                preview_image = await loop.run_in_executor(None, make_preview_image, content)
+                preview = await preview_model.detect(preview_image)
+                yield sse_event("preview", PillCountResult(
+                    pill_count=preview["count"],
+                    confidence=preview["confidence"],
+                    image_path=image_path
+                ).model_dump_json(exclude_none=True))
+            except Exception:
+                # The full pass still runs; only the early estimate is lost
+                logger.warning("Preview detection failed", exc_info=True)
+        
+        try:
+            result = await model.detect(content)
+            yield sse_event("result", build_pill_count_result(result, image_path, compact).model_dump_json(exclude_none=True))
+        except InferenceQueueFullError:
+            yield sse_event("error", json.dumps({"status_code": 429, "detail": "Too many detection requests, please retry"}))
+        except InferenceTimeoutError:
+            yield sse_event("error", json.dumps({"status_code": 504, "detail": "Detection timed out"}))
+        except Exception as e:
+            yield sse_event("error", json.dumps({"status_code": 500, "detail": f"Detection failed: {str(e)}"}))
+    
+    # Disable proxy buffering so the preview reaches the client as soon as it is ready
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/submit", response_model=RecordResponse)
 async def submit_record(
     record_data: RecordCreate,
     db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user: User = Depends(current_user)
 ):
     """Submit final pill count (AI or manual)"""
-    user = auth_service.get_current_user(db, credentials.credentials)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
     # Create new record
     record = Record(
         patient_id=record_data.patient_id,
@@ -151,21 +367,42 @@ async def submit_record(
         timestamp=record.timestamp
     )
 
-@app.get("/records", response_model=List[RecordResponse])
+# Columns /records can return; ?fields= selects a subset
+RECORD_FIELDS = tuple(RecordResponse.model_fields)
+
+# Rows are returned as projected dicts, so RecordResponse only documents the response
+@app.get("/records", responses={200: {"model": List[RecordResponse]}})
 async def get_records(
     patient_id: Optional[int] = None,
     supplement_id: Optional[int] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    limit: int = Query(RECORDS_PAGE_SIZE, ge=1, le=RECORDS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user: User = Depends(current_user)
 ):
-    """Get pill count records with optional filtering"""
-    user = auth_service.get_current_user(db, credentials.credentials)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    """
+    Get pill count records with optional filtering, newest first, one page at a time
+
+    When more records follow, the X-Next-Cursor response header holds the
+    cursor to pass back for the next page. fields is a comma-separated list
+    of the record fields to return (all by default); only those columns are
+    loaded.
+    """
+    requested = [name.strip() for name in fields.split(",") if name.strip()] if fields else list(RECORD_FIELDS)
+    unknown = sorted(set(requested) - set(RECORD_FIELDS))
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(RECORD_FIELDS)}"
+        )
     
-    query = db.query(Record)
+    returned = [name for name in RECORD_FIELDS if name in requested]
+    # The page boundary needs timestamp and id even when they are not returned
+    columns = [name for name in RECORD_FIELDS if name in returned or name in ("id", "timestamp")]
+    query = db.query(Record).with_entities(*[getattr(Record, name) for name in columns])
     
     if patient_id:
         query = query.filter(Record.patient_id == patient_id)
@@ -176,33 +413,123 @@ async def get_records(
     if end_date:
         query = query.filter(Record.timestamp <= end_date)
     
-    records = query.order_by(Record.timestamp.desc()).all()
+    try:
+        rows, next_cursor = keyset_page(query, Record.timestamp, Record.id, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return [RecordResponse(
-        id=r.id,
-        patient_id=r.patient_id,
-        supplement_id=r.supplement_id,
-        pill_count=r.pill_count,
-        source=r.source,
-        confidence=r.confidence,
-        timestamp=r.timestamp
-    ) for r in records]
+    # Plain rows are serialized directly; building RecordResponse models per row costs more than the query
+    records = [{name: getattr(row, name) for name in returned} for row in rows]
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return JSONResponse(content=jsonable_encoder(records), headers=headers)
+
+@app.on_event("startup")
+async def start_model_warm_up():
+    """Load and warm up the detection models in the background so /health answers immediately"""
+    app.state.model_warm_up = asyncio.ensure_future(model_registry.warm_up())
+
+@app.on_event("startup")
+async def start_continuous_profiler():
+    """Start low-rate whole-process sampling when CONTINUOUS_PROFILING is set"""
+    if continuous_profiler is not None:
+        continuous_profiler.start()
+
+@app.on_event("shutdown")
+async def shutdown_inference_scheduler():
+    """Stop the micro-batching dispatchers"""
+    await model_registry.shutdown()
+
+@app.on_event("shutdown")
+async def stop_continuous_profiler():
+    """Stop whole-process sampling"""
+    if continuous_profiler is not None:
+        continuous_profiler.stop()
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: succeeds once the detection model is loaded and warmed up"""
+    warm_up = getattr(app.state, "model_warm_up", None)
+    if warm_up is None or not warm_up.done():
+        raise HTTPException(status_code=503, detail="Model is warming up")
+    if warm_up.exception() is not None:
+        raise HTTPException(status_code=503, detail=f"Model failed to load: {str(warm_up.exception())}")
+    return {"status": "ready", "timestamp": datetime.now().isoformat()}
+
+@app.get("/cache/stats")
+async def detection_cache_stats(
+    user: User = Depends(admin_user)
+):
+    """Hit/miss counters for the pill detection result cache"""
+    return model_registry.result_cache.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Request, upload stage and database timings in the Prometheus text format"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/profiles", response_model=List[ProfileSummary])
+async def list_profiles(
+    user: User = Depends(admin_user)
+):
+    """Recent request and continuous profiles, newest first"""
+    return [profile.summary() for profile in profile_store.list()]
+
+@app.post("/admin/profiles/arm")
+async def arm_request_profiling(
+    arm_request: ProfileArmRequest,
+    user: User = Depends(admin_user)
+):
+    """Profile the next requests to a path, e.g. {"path": "/upload", "count": 5}"""
+    return {"path": arm_request.path, "pending": profile_store.arm(arm_request.path, arm_request.count)}
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(
+    profile_id: str,
+    user: User = Depends(admin_user)
+):
+    """Sampled stacks in collapsed format, for flamegraph.pl or speedscope"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.collapsed()
+
+@app.get("/models", response_model=List[DetectionModelInfo])
+async def list_detection_models(
+    user: User = Depends(admin_user)
+):
+    """List the detection models available per quality level"""
+    return model_registry.describe()
+
+@app.put("/models/{quality}", response_model=DetectionModelInfo)
+async def swap_detection_model(
+    quality: str,
+    swap_request: ModelSwapRequest,
+    user: User = Depends(admin_user)
+):
+    """Hot-swap the weights serving a quality level; the old model keeps serving until the new one is warm"""
+    if quality not in model_registry.qualities:
+        raise HTTPException(status_code=404, detail=f"No model configured for quality '{quality}'")
+    
+    try:
+        await model_registry.swap(quality, swap_request.weights_path)
+    except DisallowedWeightsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not load model: {str(e)}")
+    
+    return next(model for model in model_registry.describe() if model["quality"] == quality)
+
 @app.get("/export/csv")
 async def export_csv(
     db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user: User = Depends(current_user)
 ):
     """Export records as CSV"""
-    user = auth_service.get_current_user(db, credentials.credentials)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
     records = db.query(Record).all()
     
     # Create CSV content
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -17,6 +17,14 @@ class UserResponse(BaseModel):
     email: str
     name: str
     token: str
+    refresh_token: Optional[str] = None
+
+class TokenRefreshRequest(BaseModel):
+    refresh_token: str
+
+class TokenRefreshResponse(BaseModel):
+    token: str
+    refresh_token: str
 
 # Patient schemas
 class PatientResponse(BaseModel):
@@ -54,8 +62,35 @@ class RecordResponse(BaseModel):
 class PillCountResult(BaseModel):
     pill_count: int
     confidence: float
-    bounding_boxes: List[Dict[str, Any]]
+    bounding_boxes: Optional[List[Dict[str, Any]]] = None
     image_path: str
+    # Compact format: parallel arrays instead of bounding_boxes
+    boxes: Optional[List[List[float]]] = None
+    confidences: Optional[List[float]] = None
+    class_ids: Optional[List[int]] = None
+
+# Detection model schemas
+class DetectionModelInfo(BaseModel):
+    quality: str
+    weights_path: str
+    max_concurrency: int
+    default: bool
+
+class ModelSwapRequest(BaseModel):
+    weights_path: str
+
+# Profiling schemas
+class ProfileSummary(BaseModel):
+    id: str
+    kind: str
+    label: str
+    started_at: str
+    duration_s: float
+    samples: int
+
+class ProfileArmRequest(BaseModel):
+    path: str
+    count: int = Field(default=1, ge=1, le=100)
 
 # Barcode scan response
 class BarcodeScanResponse(BaseModel):
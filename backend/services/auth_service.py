@@ -1,23 +1,119 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
-from database.models import User
+from database.models import RefreshToken, User
 
 # Security configuration
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Refresh tokens let the PWA get new access tokens without a password (and bcrypt) for this long
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+# Password hashing. Hashes made with a different cost are upgraded on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt takes ~100-300 ms per call and releases the GIL, so it runs on a few dedicated
+# threads: login bursts queue there instead of blocking the event loop or starving inference
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+password_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+# Resolved users are kept briefly by token subject so most requests skip the users query;
+# 0 disables the cache. Changes made in this process invalidate entries immediately,
+# changes made elsewhere (another uvicorn worker, a script) within the TTL.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+# Decoded tokens kept by raw token string, so repeat requests skip signature checks and JSON decoding
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+class UserCache:
+    """Short-lived LRU cache of users by email"""
+
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_SIZE):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+        _user_caches.add(self)
+
+    def get(self, email: str) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            stored_at, user = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[email]
+                return None
+            self._entries.move_to_end(email)
+            return user
+
+    def set(self, email: str, user: User):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[email] = (time.monotonic(), user)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Every live cache, so a change to a user reaches all AuthService instances
+_user_caches: "weakref.WeakSet[UserCache]" = weakref.WeakSet()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, user: User):
+    """Drop a deactivated, edited or deleted user from the caches (under its old email too)"""
+    emails = {user.email, *inspect(user).attrs.email.history.deleted}
+    for cache in list(_user_caches):
+        for email in emails:
+            cache.invalidate(email)
 
 class AuthService:
+    def __init__(self, user_cache: Optional[UserCache] = None, token_cache_size: int = TOKEN_CACHE_SIZE):
+        self.user_cache = user_cache or UserCache()
+        self.token_cache_size = token_cache_size
+        # Raw token -> (subject, expiry as a Unix timestamp)
+        self._decoded_tokens: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._token_lock = threading.Lock()
+    
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
         return pwd_context.verify(plain_password, hashed_password)
     
+    def verify_and_update_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; also returns a new hash if the stored one uses an outdated cost"""
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    
     def get_password_hash(self, password: str) -> str:
         """Hash a password"""
         return pwd_context.hash(password)
@@ -27,10 +123,20 @@ class AuthService:
         user = db.query(User).filter(User.email == email).first()
         if not user:
             return None
-        if not self.verify_password(password, user.hashed_password):
+        valid, new_hash = self.verify_and_update_password(password, user.hashed_password)
+        if not valid:
             return None
+        if new_hash:
+            # BCRYPT_ROUNDS changed since this hash was made; store it at the new cost
+            user.hashed_password = new_hash
+            db.commit()
         return user
     
+    async def authenticate_user_async(self, db: Session, email: str, password: str) -> Optional[User]:
+        """authenticate_user on the password hashing threads, for async handlers"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_hash_executor, self.authenticate_user, db, email, password)
+    
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None):
         """Create JWT access token"""
         to_encode = data.copy()
@@ -45,19 +151,107 @@ class AuthService:
     
     def verify_token(self, token: str) -> Optional[str]:
         """Verify JWT token and return email"""
+        with self._token_lock:
+            decoded = self._decoded_tokens.get(token)
+            if decoded is not None:
+                email, expires_at = decoded
+                if time.time() < expires_at:
+                    self._decoded_tokens.move_to_end(token)
+                    return email
+                del self._decoded_tokens[token]
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             email: str = payload.get("sub")
             if email is None:
                 return None
-            return email
         except JWTError:
             return None
+        # Only tokens that expire are remembered; the expiry is re-checked on every hit
+        if "exp" in payload and self.token_cache_size > 0:
+            with self._token_lock:
+                self._decoded_tokens[token] = (email, float(payload["exp"]))
+                while len(self._decoded_tokens) > self.token_cache_size:
+                    self._decoded_tokens.popitem(last=False)
+        return email
+    
+    def create_refresh_token(self, db: Session, user: User, family_id: Optional[str] = None) -> str:
+        """Issue a refresh token for the user, stored server-side by its hash"""
+        token = secrets.token_urlsafe(32)
+        db.add(RefreshToken(
+            user_id=user.id,
+            token_hash=self._hash_refresh_token(token),
+            family_id=family_id or secrets.token_hex(16),
+            expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            revoked=False
+        ))
+        db.commit()
+        return token
+    
+    def rotate_refresh_token(self, db: Session, refresh_token: str) -> Optional[Tuple[User, str]]:
+        """
+        Exchange a refresh token for a new one, returning the user and the new token
+        
+        Each refresh token works once. Presenting one that was already used
+        means it was copied, so every token from the same login is revoked.
+        The user's expired tokens are deleted along the way.
+        """
+        now = datetime.utcnow()
+        stored = db.query(RefreshToken).filter(
+            RefreshToken.token_hash == self._hash_refresh_token(refresh_token)
+        ).first()
+        if stored is None or stored.expires_at < now:
+            return None
+        user = stored.user
+        if user is None or not user.is_active:
+            return None
+        
+        # Claim the token in one conditional UPDATE rather than checking the loaded row:
+        # of concurrent refreshes with the same token only one can match revoked = false
+        claimed = db.query(RefreshToken).filter(
+            RefreshToken.id == stored.id, RefreshToken.revoked.is_(False)
+        ).update({"revoked": True}, synchronize_session=False)
+        if claimed != 1:
+            db.rollback()
+            self._revoke_family(db, stored.family_id)
+            return None
+        
+        # Revoked tokens stay until they expire so a replay is still recognised
+        db.query(RefreshToken).filter(
+            RefreshToken.user_id == user.id, RefreshToken.expires_at < now
+        ).delete(synchronize_session=False)
+        return user, self.create_refresh_token(db, user, stored.family_id)
+    
+    def revoke_refresh_token(self, db: Session, refresh_token: str):
+        """Delete a refresh token and every token rotated from the same login (logout)"""
+        stored = db.query(RefreshToken).filter(
+            RefreshToken.token_hash == self._hash_refresh_token(refresh_token)
+        ).first()
+        if stored is not None:
+            # None of the family can be used again, so nothing is kept to recognise replays by
+            db.query(RefreshToken).filter(
+                RefreshToken.family_id == stored.family_id
+            ).delete(synchronize_session=False)
+            db.commit()
+    
+    def _revoke_family(self, db: Session, family_id: str):
+        db.query(RefreshToken).filter(RefreshToken.family_id == family_id).update({"revoked": True})
+        db.commit()
+    
+    @staticmethod
+    def _hash_refresh_token(refresh_token: str) -> str:
+        # Refresh tokens are random, so a fast unsalted hash is enough to keep a leaked table useless
+        return hashlib.sha256(refresh_token.encode()).hexdigest()
     
     def get_current_user(self, db: Session, token: str) -> Optional[User]:
-        """Get current user from token"""
+        """Get current user from token, from the user cache when recently resolved"""
         email = self.verify_token(token)
         if email is None:
             return None
-        user = db.query(User).filter(User.email == email).first()
+        user = self.user_cache.get(email)
+        if user is None:
+            user = db.query(User).filter(User.email == email).first()
+            if user is not None:
+                # Detached, so commits in this session cannot expire the cached copy's attributes
+                db.expunge(user)
+                self.user_cache.set(email, user)
         return user
@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Result cache configuration
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "1024"))
+DETECTION_CACHE_TTL_SECONDS = float(os.getenv("DETECTION_CACHE_TTL_SECONDS", "86400"))
+DETECTION_CACHE_PATH = os.getenv("DETECTION_CACHE_PATH", "")  # empty keeps the cache in memory only
+
+class DetectionCache:
+    """LRU cache of detection results keyed by image content, optionally persisted to SQLite"""
+
+    # How many writes between sweeps of expired rows in the persistent store
+    PRUNE_INTERVAL = 256
+
+    def __init__(
+        self,
+        max_entries: int = DETECTION_CACHE_SIZE,
+        ttl_seconds: float = DETECTION_CACHE_TTL_SECONDS,
+        db_path: Optional[str] = DETECTION_CACHE_PATH or None
+    ):
+        """
+        Args:
+            max_entries: Results kept in memory before the least recently used is evicted
+            ttl_seconds: Age after which a cached result is ignored
+            db_path: SQLite file used to keep results across restarts; None disables it
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS detection_cache "
+                "(key TEXT PRIMARY KEY, created_at REAL, result TEXT)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, result = entry
+                if now - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(result)
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created_at, result FROM detection_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[0] <= self.ttl:
+                    result = json.loads(row[1])
+                    self._remember(key, row[0], result)
+                    self.hits += 1
+                    return dict(result)
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, result: Dict[str, Any]):
+        """Store a detection result"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, result)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO detection_cache (key, created_at, result) VALUES (?, ?, ?)",
+                    (key, now, json.dumps(result))
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_INTERVAL == 0:
+                    self._db.execute(
+                        "DELETE FROM detection_cache WHERE created_at < ?", (now - self.ttl,)
+                    )
+                self._db.commit()
+
+    def _remember(self, key: str, created_at: float, result: Dict[str, Any]):
+        """Insert into the in-memory LRU, evicting the oldest entries past max_entries"""
+        self._entries[key] = (created_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached result and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM detection_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring cache savings"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+                "entries": len(self._entries),
+                "persistent": self._db is not None
+            }
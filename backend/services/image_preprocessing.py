@@ -0,0 +1,66 @@
+import io
+import os
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+# Decode uploads at roughly this size (longest side used by the model); 0 keeps full resolution
+DECODE_TARGET_SIZE = int(os.getenv("DECODE_TARGET_SIZE", "640"))
+
+# Longest side of the downscaled image used for quick preview counts
+PREVIEW_IMAGE_SIZE = int(os.getenv("PREVIEW_IMAGE_SIZE", "320"))
+
+# EXIF orientations that swap width and height
+_TRANSPOSING_ORIENTATIONS = {5, 6, 7, 8}
+
+class PreprocessedImage(NamedTuple):
+    """A decoded, upright BGR image and how it maps back to the uploaded image"""
+    image: np.ndarray
+    scale: float  # multiply coordinates in image by this to get original pixel coordinates
+    original_size: Tuple[int, int]  # (width, height) of the upright, full-resolution image
+
+def preprocess_image_bytes(data: bytes, target_size: Optional[int] = DECODE_TARGET_SIZE) -> PreprocessedImage:
+    """
+    Decode an upload once, close to the resolution the model needs
+
+    JPEGs are decoded with libjpeg DCT scaling (PIL draft mode), which reads
+    the image directly at 1/2, 1/4 or 1/8 size instead of decoding all pixels
+    and resizing afterwards. The result is never smaller than target_size on
+    either side. EXIF orientation is applied so phones' rotated photos are upright.
+
+    Args:
+        data: Encoded image bytes
+        target_size: Smallest acceptable decoded side; None or 0 decodes at full resolution
+
+    Returns:
+        PreprocessedImage with the BGR array and the scale back to original coordinates
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            full_width, full_height = image.size
+            orientation = image.getexif().get(0x0112, 1)
+
+            if target_size and image.format == "JPEG":
+                image.draft("RGB", (target_size, target_size))
+            scale = full_width / image.size[0]
+
+            upright = ImageOps.exif_transpose(image).convert("RGB")
+    except Exception as e:
+        raise ValueError(f"Could not decode image data: {str(e)}")
+
+    if orientation in _TRANSPOSING_ORIENTATIONS:
+        full_width, full_height = full_height, full_width
+
+    bgr = cv2.cvtColor(np.asarray(upright), cv2.COLOR_RGB2BGR)
+    return PreprocessedImage(bgr, scale, (full_width, full_height))
+
+def make_preview_image(data: bytes, size: int = PREVIEW_IMAGE_SIZE) -> np.ndarray:
+    """Decode an upload straight to a small BGR image whose longest side is at most size"""
+    image = preprocess_image_bytes(data, size).image
+    height, width = image.shape[:2]
+    factor = size / max(height, width)
+    if factor >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(width * factor)), max(1, round(height * factor))), interpolation=cv2.INTER_AREA)
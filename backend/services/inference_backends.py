@@ -0,0 +1,344 @@
+import os
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.thread_tuning import configure_torch_threads, current_thread_settings
+
+# Inference backend configuration
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")  # "torch", "onnx" or "openvino"
+MODEL_PATH = os.getenv("MODEL_PATH", "yolov8n.pt")
+
+# INT8 quantization configuration (ONNX Runtime backend only)
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "fp32")  # "fp32" or "int8"
+QUANTIZATION_MODE = os.getenv("QUANTIZATION_MODE", "dynamic")  # "dynamic" or "static"
+QUANTIZATION_CALIBRATION_DIR = os.getenv("QUANTIZATION_CALIBRATION_DIR", "")
+
+class Detections(NamedTuple):
+    """Detections for one image, in original image pixel coordinates"""
+    boxes: np.ndarray  # (N, 4) float32 x1, y1, x2, y2
+    confidences: np.ndarray  # (N,) float32
+    class_ids: np.ndarray  # (N,) int64
+
+class InferenceBackend:
+    """Runs a detector on decoded BGR images and returns per-image detection arrays"""
+
+    name = "base"
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+
+    def predict(self, images: List[np.ndarray], confidence_threshold: float) -> List[Detections]:
+        """Run one batched inference; returns one Detections per image, in order"""
+        raise NotImplementedError
+
+class UltralyticsBackend(InferenceBackend):
+    """PyTorch inference through the ultralytics YOLO wrapper"""
+
+    name = "torch"
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+        # Imported here so ONNX Runtime / OpenVINO deployments never load torch
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+
+        settings = current_thread_settings()
+        if settings is not None:
+            configure_torch_threads(settings)
+
+    def predict(self, images: List[np.ndarray], confidence_threshold: float) -> List[Detections]:
+        results = self.model(images, conf=confidence_threshold, verbose=False)
+        detections = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                detections.append(_empty_detections())
+                continue
+            # One device-to-host transfer per array instead of per box
+            detections.append(Detections(
+                boxes.xyxy.cpu().numpy().astype(np.float32),
+                boxes.conf.cpu().numpy().astype(np.float32),
+                boxes.cls.cpu().numpy().astype(np.int64)
+            ))
+        return detections
+
+class ExportedYoloBackend(InferenceBackend):
+    """Shared pre/post-processing for YOLOv8 models exported without the torch runtime"""
+
+    def __init__(self, model_path: str, input_size: int = 640, iou_threshold: float = 0.45):
+        super().__init__(model_path)
+        self.input_size = input_size
+        self.iou_threshold = iou_threshold
+        self.dynamic_batch = False
+
+    def predict(self, images: List[np.ndarray], confidence_threshold: float) -> List[Detections]:
+        if not images:
+            return []
+
+        letterboxed = [_letterbox(image, self.input_size) for image in images]
+        blob = np.stack([_to_chw_float(padded) for padded, _, _ in letterboxed])
+
+        if self.dynamic_batch:
+            outputs = self._infer(blob)
+        else:
+            outputs = np.concatenate([self._infer(blob[i:i + 1]) for i in range(len(images))])
+
+        return [
+            _postprocess_yolov8(output, image.shape[:2], ratio, padding, confidence_threshold, self.iou_threshold)
+            for output, image, (_, ratio, padding) in zip(outputs, images, letterboxed)
+        ]
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        """Run the network on an NCHW float32 blob; returns raw (N, 4 + classes, anchors) output"""
+        raise NotImplementedError
+
+class OnnxRuntimeBackend(ExportedYoloBackend):
+    """CPU inference of an exported YOLOv8 ONNX model through ONNX Runtime"""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, input_size: int = 640, iou_threshold: float = 0.45):
+        super().__init__(model_path, input_size, iou_threshold)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        settings = current_thread_settings()
+        if settings is not None:
+            options.intra_op_num_threads = settings.intra_op_threads
+            options.inter_op_num_threads = settings.inter_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: blob})[0]
+
+class OpenVinoBackend(ExportedYoloBackend):
+    """CPU inference of an exported YOLOv8 OpenVINO IR model"""
+
+    name = "openvino"
+
+    def __init__(self, model_path: str, input_size: int = 640, iou_threshold: float = 0.45):
+        super().__init__(model_path, input_size, iou_threshold)
+        import openvino as ov
+
+        settings = current_thread_settings()
+        config = {"INFERENCE_NUM_THREADS": settings.intra_op_threads} if settings is not None else {}
+        self.compiled_model = ov.Core().compile_model(model_path, "CPU", config)
+        self.output = self.compiled_model.output(0)
+        self.dynamic_batch = self.compiled_model.input(0).get_partial_shape()[0].is_dynamic
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        return self.compiled_model([blob])[self.output]
+
+def weights_version(
+    model_path: str = MODEL_PATH,
+    backend: str = INFERENCE_BACKEND,
+    precision: str = MODEL_PRECISION
+) -> str:
+    """
+    Identify the backend and weights create_backend would load, without loading them
+
+    The API process keys cached results with this, so it can answer repeat
+    uploads even when the models only live in inference worker processes.
+    """
+    version = f"{backend}:{precision}:{model_path}"
+    if os.path.exists(model_path):
+        version += f":{int(os.path.getmtime(model_path))}"
+    return version
+
+def create_backend(
+    backend: str = INFERENCE_BACKEND,
+    model_path: str = MODEL_PATH,
+    precision: str = MODEL_PRECISION
+) -> InferenceBackend:
+    """
+    Load the configured inference backend
+
+    For "onnx" and "openvino", a .pt path is exported to that format on first use
+    (this one-off step needs ultralytics); afterwards only the exported model is loaded.
+    precision="int8" loads an INT8-quantized copy of the ONNX model, quantizing it on first use.
+    """
+    if precision not in ("fp32", "int8"):
+        raise ValueError(f"Unknown model precision: {precision}")
+    if precision == "int8" and backend != "onnx":
+        raise ValueError("INT8 models are only supported with the onnx backend")
+
+    if backend == "torch":
+        return UltralyticsBackend(model_path)
+    if backend == "onnx":
+        onnx_path = _exported_model_path(model_path, "onnx")
+        if precision == "int8":
+            onnx_path = _quantized_model_path(onnx_path)
+        return OnnxRuntimeBackend(onnx_path)
+    if backend == "openvino":
+        return OpenVinoBackend(_exported_model_path(model_path, "openvino"))
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+def _exported_model_path(model_path: str, export_format: str) -> str:
+    """Return the exported model for model_path, exporting it if it does not exist yet"""
+    if not model_path.endswith(".pt"):
+        return model_path
+
+    stem = model_path[:-len(".pt")]
+    if export_format == "onnx":
+        exported = f"{stem}.onnx"
+    else:
+        exported = os.path.join(f"{stem}_openvino_model", f"{os.path.basename(stem)}.xml")
+
+    if not os.path.exists(exported):
+        from ultralytics import YOLO
+        YOLO(model_path).export(format=export_format, dynamic=True)
+    return exported
+
+def _quantized_model_path(onnx_path: str) -> str:
+    """Return the INT8 copy of onnx_path, quantizing it with the configured mode if missing"""
+    if onnx_path.endswith(".int8.onnx"):
+        return onnx_path
+
+    quantized = f"{onnx_path[:-len('.onnx')]}.int8.onnx"
+    if not os.path.exists(quantized):
+        calibration_images = None
+        if QUANTIZATION_MODE == "static":
+            calibration_images = _load_calibration_images(QUANTIZATION_CALIBRATION_DIR)
+        quantize_onnx_model(onnx_path, quantized, QUANTIZATION_MODE, calibration_images)
+    return quantized
+
+def quantize_onnx_model(
+    fp32_path: str,
+    int8_path: str,
+    mode: str = "dynamic",
+    calibration_images: Optional[List[np.ndarray]] = None,
+    input_size: int = 640
+) -> str:
+    """
+    Write an INT8-quantized copy of an FP32 ONNX model
+
+    Args:
+        fp32_path: Exported FP32 ONNX model
+        int8_path: Where to write the quantized model
+        mode: "dynamic" quantizes weights only; "static" also quantizes activations
+            using ranges observed on calibration_images
+        calibration_images: Decoded BGR images representative of production uploads
+        input_size: Model input resolution used when preparing calibration images
+
+    Returns:
+        int8_path
+    """
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+
+    if mode == "dynamic":
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+    if mode != "static":
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    if not calibration_images:
+        raise ValueError("Static quantization needs calibration images")
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class ImageCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.blobs = iter(
+                _to_chw_float(_letterbox(image, input_size)[0])[None] for image in calibration_images
+            )
+
+        def get_next(self):
+            blob = next(self.blobs, None)
+            return None if blob is None else {input_name: blob}
+
+    quantize_static(
+        fp32_path, int8_path, ImageCalibrationReader(),
+        quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8
+    )
+    return int8_path
+
+def _load_calibration_images(directory: str, limit: int = 100) -> List[np.ndarray]:
+    """Read up to limit images from directory for static quantization"""
+    if not directory or not os.path.isdir(directory):
+        raise ValueError("QUANTIZATION_CALIBRATION_DIR must point to a folder of images")
+    images = []
+    for name in sorted(os.listdir(directory)):
+        image = cv2.imread(os.path.join(directory, name))
+        if image is not None:
+            images.append(image)
+        if len(images) >= limit:
+            break
+    return images
+
+def _empty_detections() -> Detections:
+    return Detections(
+        np.zeros((0, 4), dtype=np.float32),
+        np.zeros(0, dtype=np.float32),
+        np.zeros(0, dtype=np.int64)
+    )
+
+def _letterbox(image: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """Resize keeping aspect ratio and pad to size x size, as ultralytics does"""
+    height, width = image.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    pad_x, pad_y = (size - new_width) / 2, (size - new_height) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(resized, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, ratio, (left, top)
+
+def _to_chw_float(image: np.ndarray) -> np.ndarray:
+    """BGR HWC uint8 to RGB CHW float32 in [0, 1]"""
+    return np.ascontiguousarray(image[:, :, ::-1].transpose(2, 0, 1), dtype=np.float32) / 255.0
+
+def _postprocess_yolov8(
+    output: np.ndarray,
+    image_shape: Tuple[int, int],
+    ratio: float,
+    padding: Tuple[float, float],
+    confidence_threshold: float,
+    iou_threshold: float,
+    max_detections: int = 300
+) -> Detections:
+    """Decode one raw YOLOv8 output, apply class-aware NMS and map boxes to the original image"""
+    predictions = output.T  # (anchors, 4 + classes)
+    scores = predictions[:, 4:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    keep = confidences >= confidence_threshold
+    if not keep.any():
+        return _empty_detections()
+    predictions, class_ids, confidences = predictions[keep], class_ids[keep], confidences[keep]
+
+    center_x, center_y, box_width, box_height = predictions[:, :4].T
+    boxes = np.stack([
+        center_x - box_width / 2, center_y - box_height / 2,
+        center_x + box_width / 2, center_y + box_height / 2
+    ], axis=1)
+
+    # Offset boxes by class so NMS only suppresses overlaps within the same class
+    offsets = (class_ids * 4096.0)[:, None]
+    nms_boxes = np.concatenate([boxes[:, :2] + offsets, boxes[:, 2:] - boxes[:, :2]], axis=1)
+    indices = cv2.dnn.NMSBoxes(nms_boxes.tolist(), confidences.tolist(), confidence_threshold, iou_threshold)
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:max_detections]
+
+    boxes = boxes[indices]
+    boxes[:, [0, 2]] -= padding[0]
+    boxes[:, [1, 3]] -= padding[1]
+    boxes /= ratio
+    height, width = image_shape
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+
+    return Detections(
+        boxes.astype(np.float32),
+        confidences[indices].astype(np.float32),
+        class_ids[indices].astype(np.int64)
+    )
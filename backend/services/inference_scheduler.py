@@ -0,0 +1,200 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from services.shared_memory_pool import SharedMemoryProcessPoolExecutor
+from services.thread_tuning import ThreadSettings, apply_thread_settings
+
+# Micro-batching configuration
+BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "20"))
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+
+# Worker pool configuration
+INFERENCE_POOL = os.getenv("INFERENCE_POOL", "thread")  # "thread" or "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1")) or os.cpu_count() or 1  # 0 uses one per CPU core
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
+# Hand decoded images to process workers through shared memory instead of pickling them
+INFERENCE_SHARED_MEMORY = os.getenv("INFERENCE_SHARED_MEMORY", "true").lower() in ("1", "true", "yes")
+
+class InferenceQueueFullError(Exception):
+    """Raised when the inference queue cannot accept more requests"""
+
+class InferenceTimeoutError(Exception):
+    """Raised when a request waits longer than the configured timeout"""
+
+def create_inference_executor(
+    pool_type: str = INFERENCE_POOL,
+    workers: int = INFERENCE_WORKERS,
+    shared_memory: bool = INFERENCE_SHARED_MEMORY,
+    thread_settings: Optional[ThreadSettings] = None
+) -> Executor:
+    """
+    Create the thread or process pool that runs model inference
+
+    Process workers apply thread_settings before loading their model; thread
+    pools share the settings already applied to the API process.
+    """
+    if pool_type == "process":
+        initializer = {"initializer": apply_thread_settings, "initargs": (thread_settings,)} if thread_settings else {}
+        if shared_memory:
+            return SharedMemoryProcessPoolExecutor(max_workers=workers, **initializer)
+        return ProcessPoolExecutor(max_workers=workers, **initializer)
+    if pool_type == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+    raise ValueError(f"Unknown inference pool type: {pool_type}")
+
+class InferenceScheduler:
+    """Collects concurrent detection requests into micro-batches run in a worker pool"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Dict[str, Any]]],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        batch_window_ms: float = BATCH_WINDOW_MS,
+        executor: Optional[Executor] = None,
+        max_workers: int = INFERENCE_WORKERS,
+        max_queue_size: int = INFERENCE_QUEUE_SIZE,
+        timeout_seconds: float = INFERENCE_TIMEOUT_SECONDS
+    ):
+        """
+        Args:
+            batch_fn: Function running detection on a list of images, e.g. detect_pills_batch.
+                Must be picklable when used with a process pool.
+            max_batch_size: Largest number of requests dispatched together
+            batch_window_ms: How long the first request in a batch waits for others to join
+            executor: Pool running batch_fn; a thread pool of max_workers is created if omitted
+            max_workers: Number of batches allowed to run at the same time
+            max_queue_size: Requests allowed to wait before new ones are rejected
+            timeout_seconds: Longest a single request may wait for its result
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout_seconds
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatches: Set[asyncio.Task] = set()
+        # run_batch calls in flight; each holds its images, so they count against max_queue_size
+        self._batch_waiters = 0
+
+    async def submit(self, image: Any) -> Dict[str, Any]:
+        """Queue an image for detection and wait for its result"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        if self._is_full():
+            raise InferenceQueueFullError("Inference queue is full")
+        try:
+            self._queue.put_nowait((image, future))
+        except asyncio.QueueFull:
+            raise InferenceQueueFullError("Inference queue is full")
+
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise InferenceTimeoutError(f"Inference did not finish within {self.timeout}s")
+
+    async def run_batch(self, images: List[Any]) -> List[Dict[str, Any]]:
+        """Run an already-formed batch in the worker pool, skipping the batching window"""
+        self._ensure_started()
+        if self._is_full():
+            raise InferenceQueueFullError("Inference queue is full")
+
+        self._batch_waiters += 1
+        try:
+            return await asyncio.wait_for(self._run_when_slot_free(images), self.timeout)
+        except asyncio.TimeoutError:
+            raise InferenceTimeoutError(f"Inference did not finish within {self.timeout}s")
+        finally:
+            self._batch_waiters -= 1
+
+    def _is_full(self) -> bool:
+        """Whether queued requests and in-flight batches have reached max_queue_size"""
+        return self._queue.qsize() + self._batch_waiters >= self.max_queue_size
+
+    async def _run_when_slot_free(self, images: List[Any]) -> List[Dict[str, Any]]:
+        await self._slots.acquire()
+        # Shield so a timed-out caller does not release the slot while the pool is still busy
+        return await asyncio.shield(self._submit_to_pool(images))
+
+    def _submit_to_pool(self, images: List[Any]) -> asyncio.Future:
+        """Hand a batch to the executor; the caller must already hold a worker slot"""
+        future = self._loop.run_in_executor(self.executor, self.batch_fn, images)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _ensure_started(self):
+        """Start the dispatcher on the running event loop if it is not already there"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._worker = loop.create_task(self._run())
+
+    async def _run(self):
+        """Dispatcher loop: wait for a request and a free worker, gather a batch, hand it to the pool"""
+        while True:
+            first = await self._queue.get()
+            # Requests keep queueing while all workers are busy, so batches grow under load
+            await self._slots.acquire()
+            batch = await self._collect_batch(first)
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = self._loop.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _collect_batch(self, first: Tuple[Any, asyncio.Future]) -> List[Tuple[Any, asyncio.Future]]:
+        """Take up to max_batch_size live requests arriving within the batching window"""
+        batch = [first]
+        deadline = self._loop.time() + self.batch_window
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Requests that already timed out are not worth running
+        return [(image, future) for image, future in batch if not future.done()]
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """Run one batch in the pool and resolve the waiting futures"""
+        images = [image for image, _ in batch]
+        try:
+            results = await self._submit_to_pool(images)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def shutdown(self):
+        """Stop the dispatcher task; the worker pool is kept so the scheduler can restart"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
@@ -0,0 +1,279 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.detection_cache import DetectionCache
+from services.inference_backends import MODEL_PATH, InferenceBackend, create_backend
+from services.inference_scheduler import (
+    INFERENCE_POOL, INFERENCE_WORKERS, InferenceScheduler, create_inference_executor
+)
+from services.pill_detection_service import (
+    PillDetectionService, detect_pills_batch_in_worker, warm_up_in_worker
+)
+
+# Detector weights per quality level, e.g. "fast=yolov8n.pt,accurate=yolov8s.pt"
+DETECTION_MODELS = os.getenv("DETECTION_MODELS", f"standard={MODEL_PATH}")
+DEFAULT_QUALITY = os.getenv("DEFAULT_QUALITY", "")  # empty uses the first configured quality
+PREVIEW_QUALITY = os.getenv("PREVIEW_QUALITY", "fast")  # falls back to the default quality if not configured
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "0"))  # batches per model at once; 0 allows every worker
+# Hot swaps may only load weights from this directory (or the configured DETECTION_MODELS paths).
+# Loading .pt weights unpickles them, so an arbitrary path would run arbitrary code.
+MODEL_WEIGHTS_DIR = os.getenv("MODEL_WEIGHTS_DIR", "models")
+
+class UnknownQualityError(Exception):
+    """Raised when a request asks for a quality level with no model configured"""
+
+class DisallowedWeightsError(Exception):
+    """Raised when a swap names weights outside the weights directory and the configured models"""
+
+def parse_model_config(config: str) -> Dict[str, str]:
+    """Parse "quality=path,quality=path" into a mapping, keeping the configured order"""
+    models = {}
+    for item in config.split(","):
+        if not item.strip():
+            continue
+        quality, separator, model_path = item.partition("=")
+        if not separator or not quality.strip() or not model_path.strip():
+            raise ValueError(f"Invalid model entry '{item}', expected quality=path")
+        models[quality.strip()] = model_path.strip()
+    if not models:
+        raise ValueError("At least one detection model must be configured")
+    return models
+
+class RegisteredModel:
+    """One detector version with its own micro-batching queue and concurrency cap"""
+
+    def __init__(self, quality: str, model_path: str, service: PillDetectionService, scheduler: InferenceScheduler):
+        self.quality = quality
+        self.model_path = model_path
+        self.service = service
+        self.scheduler = scheduler
+
+    async def detect(self, image: Any) -> Dict[str, Any]:
+        """Compact result for one image, micro-batched with other requests unless cached"""
+        results = await self._detect_uncached(
+            [image], lambda pending: asyncio.gather(*map(self.scheduler.submit, pending))
+        )
+        return results[0]
+
+    async def detect_batch(self, images: List[Any]) -> List[Dict[str, Any]]:
+        """Compact results for several images, the uncached ones run as one batch"""
+        return await self._detect_uncached(images, self.scheduler.run_batch)
+
+    async def _detect_uncached(self, images: List[Any], run) -> List[Dict[str, Any]]:
+        """
+        Answer images from the result cache and pass only the rest to run
+
+        The cache is checked here in the API process, before anything is
+        queued, so repeat uploads take no queue or worker slot (and cannot be
+        turned away with a 429 or time out). With a process pool this is also
+        the only cache: workers have their own memory. Hashing uploads and a
+        persistent cache's SQLite reads and writes run in a thread, off the
+        event loop.
+        """
+        keys, results = await asyncio.to_thread(self._lookup, images)
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        if pending:
+            detections = await run([images[index] for index in pending])
+            new_results = {}
+            for index, detection in zip(pending, detections):
+                # Only results that ran the model carry timings; undecodable images are not cached
+                if keys[index] is not None and "timings" in detection:
+                    new_results[keys[index]] = {key: value for key, value in detection.items() if key != "timings"}
+                results[index] = detection
+            if new_results:
+                await asyncio.to_thread(self._store, new_results)
+        return results
+
+    def _lookup(self, images: List[Any]) -> Tuple[List[Optional[str]], List[Optional[Dict[str, Any]]]]:
+        keys = [self.service.cache_key(image) for image in images]
+        return keys, [self.service.result_cache.get(key) if key is not None else None for key in keys]
+
+    def _store(self, results: Dict[str, Dict[str, Any]]):
+        for key, result in results.items():
+            self.service.result_cache.set(key, result)
+
+class ModelRegistry:
+    """Detection models by quality level, sharing one worker pool and one result cache"""
+
+    def __init__(
+        self,
+        models: Optional[Dict[str, str]] = None,
+        executor: Optional[Executor] = None,
+        pool_type: str = INFERENCE_POOL,
+        workers: int = INFERENCE_WORKERS,
+        max_concurrency: int = MODEL_CONCURRENCY,
+        default_quality: str = DEFAULT_QUALITY,
+        preview_quality: str = PREVIEW_QUALITY,
+        weights_dir: str = MODEL_WEIGHTS_DIR
+    ):
+        """
+        Args:
+            models: Weights path per quality level; defaults to DETECTION_MODELS
+            executor: Pool running inference for every model
+            pool_type: "thread" or "process", matching the executor
+            workers: Number of workers in the executor
+            max_concurrency: Batches of one model allowed to run at the same time, so a
+                burst of requests for one model cannot take every worker
+            default_quality: Quality used when a request does not ask for one
+            preview_quality: Quality used for quick preview counts while the full pass runs
+            weights_dir: Directory hot swaps may load weights from; relative swap paths are
+                resolved against it
+        """
+        models = models or parse_model_config(DETECTION_MODELS)
+        self.pool_type = pool_type
+        self.workers = workers
+        self.max_concurrency = max_concurrency or workers
+        self.executor = executor or create_inference_executor(pool_type, workers)
+        self.weights_dir = weights_dir
+        # Warm-ups and swaps run one at a time. In process mode each one holds every worker at
+        # its own barrier, so two at once could split the pool and leave both waiting to time out.
+        self._loading = asyncio.Lock()
+        self._configured_paths = set(models.values())
+
+        # Cache keys include the model version, so models can share one cache
+        self.result_cache = DetectionCache()
+
+        self._models = {quality: self._register(quality, path) for quality, path in models.items()}
+        self.default_quality = default_quality or next(iter(self._models))
+        if self.default_quality not in self._models:
+            raise ValueError(f"Default quality '{self.default_quality}' has no model configured")
+        self.preview_quality = preview_quality if preview_quality in self._models else self.default_quality
+
+    def _register(self, quality: str, model_path: str) -> RegisteredModel:
+        service = PillDetectionService(model_path=model_path)
+        service.result_cache = self.result_cache
+        scheduler = InferenceScheduler(
+            self._batch_fn(service, quality, model_path),
+            executor=self.executor,
+            max_workers=self.max_concurrency
+        )
+        return RegisteredModel(quality, model_path, service, scheduler)
+
+    def _batch_fn(self, service: PillDetectionService, quality: str, model_path: str):
+        # Results are cached by RegisteredModel before images are queued, not in the workers.
+        # Process workers load their own models, so they need a picklable module-level function.
+        if self.pool_type == "process":
+            return partial(detect_pills_batch_in_worker, quality=quality, model_path=model_path, use_cache=False)
+        return partial(service.detect_pills_batch, compact=True, use_cache=False)
+
+    @property
+    def qualities(self) -> List[str]:
+        return list(self._models)
+
+    def get(self, quality: Optional[str] = None) -> RegisteredModel:
+        """Model serving the given quality level, or the default one"""
+        model = self._models.get(quality or self.default_quality)
+        if model is None:
+            raise UnknownQualityError(
+                f"Unknown quality '{quality}', expected one of: {', '.join(self._models)}"
+            )
+        return model
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Configured models, for the admin listing"""
+        return [
+            {
+                "quality": model.quality,
+                "weights_path": model.model_path,
+                "max_concurrency": self.max_concurrency,
+                "default": model.quality == self.default_quality
+            }
+            for model in self._models.values()
+        ]
+
+    def resolve_weights_path(self, model_path: str) -> str:
+        """
+        Path a swap may load for model_path: a configured model, or a file inside weights_dir
+
+        Relative paths are taken relative to weights_dir. Symlinks and ".."
+        are resolved before the check, so neither can point outside it.
+        """
+        if model_path in self._configured_paths:
+            return model_path
+        candidate = os.path.join(self.weights_dir, model_path)
+        weights_dir = os.path.realpath(self.weights_dir)
+        resolved = os.path.realpath(candidate)
+        if resolved != weights_dir and os.path.commonpath([resolved, weights_dir]) == weights_dir:
+            return candidate
+        raise DisallowedWeightsError(
+            f"Weights must be one of the configured models or inside the weights directory '{self.weights_dir}'"
+        )
+
+    async def warm_up(self):
+        """Load and warm up every model in the worker pool"""
+        async with self._loading:
+            if self.pool_type == "process":
+                # One model at a time: each warm-up holds every worker until all have loaded
+                for model in self._models.values():
+                    await self._warm_up_workers(model.quality, model.model_path)
+                return
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[
+                loop.run_in_executor(self.executor, model.service.warm_up) for model in self._models.values()
+            ])
+
+    async def _warm_up_workers(self, quality: str, model_path: str):
+        """
+        Load model_path in every process worker before returning
+
+        Workers are separate processes with their own models, and the pool
+        gives no control over which worker takes a call. Each of the calls
+        waits at a barrier sized to the pool until all have loaded, so no
+        worker can take two of them and every worker runs one. Callers hold
+        the loading lock.
+        """
+        loop = asyncio.get_running_loop()
+        manager = await loop.run_in_executor(None, multiprocessing.Manager)
+        try:
+            barrier = manager.Barrier(self.workers)
+            await asyncio.gather(*[
+                loop.run_in_executor(self.executor, warm_up_in_worker, quality, model_path, barrier)
+                for _ in range(self.workers)
+            ])
+        finally:
+            manager.shutdown()
+
+    async def swap(self, quality: str, model_path: str):
+        """
+        Replace the weights serving a quality level without restarting
+
+        The new model is loaded and warmed up before it takes traffic, in
+        every worker of a process pool. Requests already in flight finish on
+        the old model. Only weights allowed by resolve_weights_path can be
+        loaded.
+        """
+        model = self.get(quality)
+        model_path = self.resolve_weights_path(model_path)
+        loop = asyncio.get_running_loop()
+
+        async with self._loading:
+            if self.pool_type == "process":
+                await self._warm_up_workers(model.quality, model_path)
+                # The API process never loads the model, but its cache keys name the weights
+                model.service.swap_model(None, model_path)
+            else:
+                backend = await loop.run_in_executor(
+                    self.executor, self._load_backend, model_path, model.service.confidence_threshold
+                )
+                model.service.swap_model(backend, model_path)
+
+            model.scheduler.batch_fn = self._batch_fn(model.service, quality, model_path)
+            model.model_path = model_path
+
+    @staticmethod
+    def _load_backend(model_path: str, confidence_threshold: float, image_size: int = 640) -> InferenceBackend:
+        backend = create_backend(model_path=model_path)
+        backend.predict([np.zeros((image_size, image_size, 3), dtype=np.uint8)], confidence_threshold)
+        return backend
+
+    async def shutdown(self):
+        """Stop every model's micro-batching dispatcher"""
+        for model in self._models.values():
+            await model.scheduler.shutdown()
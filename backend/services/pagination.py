@@ -0,0 +1,57 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+# Records per page when the client does not ask, and the most it may ask for
+RECORDS_PAGE_SIZE = int(os.getenv("RECORDS_PAGE_SIZE", "100"))
+RECORDS_MAX_PAGE_SIZE = int(os.getenv("RECORDS_MAX_PAGE_SIZE", "500"))
+
+class InvalidCursorError(ValueError):
+    """Raised for a cursor that was not issued by encode_cursor"""
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just past the row with this (timestamp, id)"""
+    payload = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(payload)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+def keyset_page(
+    query: Query,
+    timestamp_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of query, newest first, and the cursor of the next page (None on the last)
+
+    Pages continue strictly after the cursor's (timestamp, id) instead of
+    using OFFSET, so every page costs an index seek plus limit rows however
+    deep it is, and rows inserted meanwhile neither repeat nor go missing.
+    The query's rows must expose both columns by name.
+    """
+    if cursor is not None:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id)
+        ))
+
+    # One extra row tells whether another page follows
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
@@ -1,87 +1,336 @@
-import cv2
 import numpy as np
-from ultralytics import YOLO
 from PIL import Image
 import os
-from typing import Dict, List, Any
+import random
+import zlib
+import hashlib
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+from services.detection_cache import DetectionCache
+from services.image_preprocessing import DECODE_TARGET_SIZE, PreprocessedImage, preprocess_image_bytes
+from services.inference_backends import MODEL_PATH, Detections, InferenceBackend, create_backend, weights_version
+from services.tiling import (
+    TILED_INFERENCE, TILE_SIZE, TILE_OVERLAP, MAX_TILES, TILE_MERGE_THRESHOLD,
+    compute_tiles, merge_detections
+)
+
+# An image can be given as a file path, raw encoded bytes, or a decoded BGR array
+ImageInput = Union[str, bytes, np.ndarray]
+
+# Bump when the layout of cached detection results changes
+RESULT_FORMAT_VERSION = 2
+
+# How long a process worker that has loaded its model waits for the others to load theirs
+WORKER_WARM_UP_TIMEOUT_SECONDS = float(os.getenv("WORKER_WARM_UP_TIMEOUT_SECONDS", "300"))
 
 class PillDetectionService:
-    def __init__(self):
-        """Initialize YOLOv8 model for pill detection"""
-        # For MVP, we'll use a pre-trained YOLOv8 model
-        # In production, this would be a custom-trained model for pill detection
-        self.model = YOLO('yolov8n.pt')  # Using nano model for speed
+    def __init__(self, backend: Optional[InferenceBackend] = None, model_path: str = MODEL_PATH):
+        """
+        Initialize YOLOv8 model for pill detection
+        
+        Args:
+            backend: Inference backend to use; defaults to the one configured by
+                INFERENCE_BACKEND and MODEL_PRECISION for model_path
+            model_path: Detector weights loaded when no backend is given
+        """
+        # For MVP, we'll use a pre-trained YOLOv8 model (nano by default, for speed)
+        # In production, this would be a custom-trained model for pill detection.
+        # PyTorch, ONNX Runtime (FP32 or INT8) and OpenVINO backends all share this contract.
+        # The model is loaded on first use (or by warm_up) so importing the API stays fast.
+        self._model = backend
+        self.model_path = model_path
+        self._model_lock = threading.Lock()
+        self.is_warm = False
         
         # Confidence threshold for pill detection
         self.confidence_threshold = 0.5
-        
+
+        # Upper bound on images sent through the model in one batched call
+        self.max_batch_size = 32
+
+        # Optional sliced inference for high-resolution images, trading latency for recall
+        self.tiled_inference = TILED_INFERENCE
+        self.tile_size = TILE_SIZE
+        self.tile_overlap = TILE_OVERLAP
+        self.max_tiles = MAX_TILES
+        self.tile_merge_threshold = TILE_MERGE_THRESHOLD
+
+        # Uploads are decoded at reduced size when the model would downscale them anyway
+        self.decode_target_size = DECODE_TARGET_SIZE
+
+        # Results keyed by image content, so re-uploads of the same photo skip inference
+        self.result_cache = DetectionCache()
+
         # Classes that might represent pills (common objects that could be pills)
         # This is a simplified approach for MVP - in production, use custom-trained model
         self.pill_classes = [0, 1, 2, 3, 4, 5]  # Common small objects that could be pills
     
-    def detect_pills(self, image_path: str) -> Dict[str, Any]:
+    @property
+    def model(self) -> InferenceBackend:
+        """Inference backend, loaded on first access"""
+        if self._model is None:
+            self.load_model()
+        return self._model
+    
+    @property
+    def model_version(self) -> str:
+        """Identifies the backend and weights, used in result cache keys; known without loading the model"""
+        return weights_version(self.model_path)
+    
+    def load_model(self) -> InferenceBackend:
+        """Load the configured backend if it is not loaded yet"""
+        with self._model_lock:
+            if self._model is None:
+                self._model = create_backend(model_path=self.model_path)
+        return self._model
+    
+    def swap_model(self, backend: InferenceBackend, model_path: str):
+        """
+        Replace the detector without restarting
+        
+        Batches already running finish on the old backend. Cached results are
+        keyed by model version, so the new weights never reuse old results.
+        """
+        with self._model_lock:
+            self._model = backend
+            self.model_path = model_path
+    
+    def warm_up(self, image_size: int = 640):
+        """Load the model and run one inference on a blank image so the first request is fast"""
+        self.load_model()
+        self.model.predict([np.zeros((image_size, image_size, 3), dtype=np.uint8)], self.confidence_threshold)
+        self.is_warm = True
+    
+    def detect_pills(self, image: ImageInput) -> Dict[str, Any]:
         """
         Detect pills in an image using YOLOv8
         
         Args:
-            image_path: Path to the image file
+            image: Path to the image file, encoded image bytes, or a decoded BGR array
             
         Returns:
             Dictionary with count, confidence, and bounding boxes
         """
-        try:
-            # Load and run inference
-            results = self.model(image_path, conf=self.confidence_threshold)
-            
-            # Process results
-            pill_detections = []
-            total_confidence = 0.0
-            detection_count = 0
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Get box coordinates and confidence
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        confidence = float(box.conf[0].cpu().numpy())
-                        class_id = int(box.cls[0].cpu().numpy())
-                        
-                        # For MVP, we'll count all detected objects as potential pills
-                        # In production, this would be filtered by custom pill classes
-                        pill_detections.append({
-                            "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                            "confidence": confidence,
-                            "class_id": class_id
-                        })
-                        
-                        total_confidence += confidence
-                        detection_count += 1
-            
-            # Calculate average confidence
-            avg_confidence = total_confidence / detection_count if detection_count > 0 else 0.0
+        return self.detect_pills_batch([image])[0]
+    
+    def detect_pills_batch(
+        self,
+        images: List[ImageInput],
+        compact: bool = False,
+        use_cache: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Detect pills in several images with a single batched YOLOv8 call
+        
+        Encoded uploads seen before are answered from the result cache and
+        skip inference entirely. Compact results that did run the model carry
+        per-stage "timings" (decode, inference, postprocess) in seconds.
+        
+        Args:
+            images: Image paths, encoded image bytes, or decoded BGR arrays
+            compact: Return detections as parallel boxes/confidences/class_ids lists
+                instead of one bounding_boxes dict per detection
+            use_cache: Look up and store results in result_cache; the model registry
+                caches in the API process instead, before images are queued
             
-            # For MVP demo, we'll simulate more realistic pill counting
-            # In production, this would be based on actual pill detection
-            simulated_count = self._simulate_pill_count(image_path, detection_count)
+        Returns:
+            One result dictionary per image, in the same order and shape as detect_pills
+        """
+        if not images:
+            return []
+        
+        keys = [self.cache_key(image) if use_cache else None for image in images]
+        results: List[Optional[Dict[str, Any]]] = [
+            self.result_cache.get(key) if key is not None else None for key in keys
+        ]
+        
+        pending = [index for index, result in enumerate(results) if result is None]
+        if pending:
+            timings: List[Dict[str, float]] = [{} for _ in pending]
+            detections = self._run_detection([images[index] for index in pending], timings)
+            for index, detection, timing in zip(pending, detections, timings):
+                if detection is None:
+                    results[index] = self._empty_result()
+                    continue
+                if keys[index] is not None:
+                    self.result_cache.set(keys[index], detection)
+                # Timings describe this call only, so they are never cached
+                results[index] = {**detection, "timings": timing}
+        
+        if compact:
+            return results
+        return [self.expand_result(result) for result in results]
+    
+    @staticmethod
+    def expand_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a compact result into the per-detection bounding_boxes format"""
+        return {
+            "count": result["count"],
+            "confidence": result["confidence"],
+            "bounding_boxes": [
+                {
+                    "bbox": bbox,
+                    "confidence": confidence,
+                    "class_id": class_id
+                }
+                for bbox, confidence, class_id in zip(result["boxes"], result["confidences"], result["class_ids"])
+            ],
+            "raw_detections": result["raw_detections"]
+        }
+    
+    def _run_detection(
+        self,
+        images: List[ImageInput],
+        timings: Optional[List[Dict[str, float]]] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Decode and run one batched inference; None marks images that failed
+        
+        If given, timings receives each image's decode, inference (the whole
+        batched forward pass it shared) and postprocess seconds.
+        """
+        timings = timings if timings is not None else [{} for _ in images]
+        
+        # Decode each image on its own so one unreadable upload does not fail the whole batch
+        decoded = []
+        for image, timing in zip(images, timings):
+            start = time.perf_counter()
+            try:
+                decoded.append(self._load_image(image))
+            except Exception as e:
+                print(f"Error decoding image for pill detection: {str(e)}")
+                decoded.append(None)
+            timing["decode"] = time.perf_counter() - start
+        
+        # Expand each image into the crops sent to the model (one crop unless tiling)
+        crops, owners, offsets = [], [], []
+        for index, prepared in enumerate(decoded):
+            if prepared is None:
+                continue
+            image = prepared.image
+            for x1, y1, x2, y2 in self._crop_regions(image):
+                crops.append(image[y1:y2, x1:x2])
+                owners.append(index)
+                offsets.append((x1, y1))
+        
+        try:
+            # All crops of all images go through the model in one forward pass
+            start = time.perf_counter()
+            predictions = self.model.predict(crops, self.confidence_threshold) if crops else []
+            inference_seconds = time.perf_counter() - start
             
-            return {
-                "count": simulated_count,
-                "confidence": avg_confidence,
-                "bounding_boxes": pill_detections,
-                "raw_detections": detection_count
-            }
+            results: List[Optional[Dict[str, Any]]] = []
+            for index, prepared in enumerate(decoded):
+                if prepared is None:
+                    results.append(None)
+                    continue
+                start = time.perf_counter()
+                mine = [position for position, owner in enumerate(owners) if owner == index]
+                if len(mine) == 1:
+                    detections = predictions[mine[0]]
+                else:
+                    detections = merge_detections(
+                        [predictions[position] for position in mine],
+                        [offsets[position] for position in mine],
+                        self.tile_merge_threshold
+                    )
+                if prepared.scale != 1.0:
+                    # Report boxes in the coordinates of the uploaded (upright) image
+                    detections = detections._replace(boxes=detections.boxes * np.float32(prepared.scale))
+                results.append(self._build_detection_result(detections, prepared.image))
+                timings[index]["inference"] = inference_seconds
+                timings[index]["postprocess"] = time.perf_counter() - start
+            return results
             
         except Exception as e:
             print(f"Error in pill detection: {str(e)}")
-            return {
-                "count": 0,
-                "confidence": 0.0,
-                "bounding_boxes": [],
-                "raw_detections": 0
-            }
-    
-    def _simulate_pill_count(self, image_path: str, detection_count: int) -> int:
+            return [None for _ in images]
+    
+    def _crop_regions(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """Regions of the image to run the model on: the whole image, plus tiles when slicing"""
+        height, width = image.shape[:2]
+        whole_image = (0, 0, width, height)
+        if not self.tiled_inference or max(height, width) <= self.tile_size:
+            return [whole_image]
+        # The whole-image pass keeps objects larger than a tile; tiles recover small pills
+        return [whole_image] + compute_tiles(height, width, self.tile_size, self.tile_overlap, self.max_tiles)
+    
+    def cache_key(self, image: ImageInput) -> Optional[str]:
+        """Content hash of an encoded upload under the current model and detection settings"""
+        if not isinstance(image, (bytes, bytearray, memoryview)):
+            return None
+        digest = hashlib.sha256(image).hexdigest()
+        tiling = f"{self.tile_size}/{self.tile_overlap}/{self.max_tiles}" if self.tiled_inference else "full"
+        return (
+            f"{RESULT_FORMAT_VERSION}:{digest}:{self.model_version}:{self.confidence_threshold}:"
+            f"{tiling}:{self._decode_target()}"
+        )
+    
+    def _decode_target(self) -> Optional[int]:
+        """Smallest side to decode uploads at; None keeps full resolution"""
+        # Tiling exists to use every pixel, so reduced decoding would defeat it
+        if self.tiled_inference or not self.decode_target_size:
+            return None
+        return self.decode_target_size
+    
+    def preprocess(self, data: bytes) -> PreprocessedImage:
+        """Decode upload bytes upright and near model resolution, keeping the scale back to the original"""
+        return preprocess_image_bytes(bytes(data), self._decode_target())
+    
+    def decode_image(self, data: bytes) -> np.ndarray:
+        """Decode encoded image bytes into a BGR array without touching the disk"""
+        return self.preprocess(data).image
+    
+    def _load_image(self, image: ImageInput) -> PreprocessedImage:
+        """Return the image decoded for inference, with its scale to original coordinates"""
+        if isinstance(image, np.ndarray):
+            height, width = image.shape[:2]
+            return PreprocessedImage(image, 1.0, (width, height))
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return self.preprocess(image)
+        if not os.path.exists(image):
+            raise ValueError(f"Could not read image: {image}")
+        with open(image, "rb") as image_file:
+            return self.preprocess(image_file.read())
+    
+    def _build_detection_result(self, detections: Detections, image: np.ndarray) -> Dict[str, Any]:
+        """Summarize the detection arrays for one image in compact, columnar form"""
+        # For MVP, we'll count all detected objects as potential pills
+        # In production, this would be filtered by custom pill classes
+        detection_count = len(detections.confidences)
+        
+        # Calculate average confidence
+        avg_confidence = float(detections.confidences.mean()) if detection_count > 0 else 0.0
+        
+        # For MVP demo, we'll simulate more realistic pill counting
+        # In production, this would be based on actual pill detection
+        simulated_count = self._simulate_pill_count(image, detection_count)
+        
+        # Whole-array tolist() calls instead of building a dict per detection;
+        # expand_result converts to the per-detection format at the API edge
+        return {
+            "count": simulated_count,
+            "confidence": avg_confidence,
+            "boxes": detections.boxes.tolist(),
+            "confidences": detections.confidences.tolist(),
+            "class_ids": detections.class_ids.tolist(),
+            "raw_detections": detection_count
+        }
+    
+    def _empty_result(self) -> Dict[str, Any]:
+        """Result returned when detection fails"""
+        return {
+            "count": 0,
+            "confidence": 0.0,
+            "boxes": [],
+            "confidences": [],
+            "class_ids": [],
+            "raw_detections": 0
+        }
+    
+    def _simulate_pill_count(self, image: np.ndarray, detection_count: int) -> int:
         """
         Simulate realistic pill counting for MVP demo
         In production, this would be replaced with actual pill detection logic
@@ -89,9 +338,8 @@ class PillDetectionService:
         # For MVP, we'll simulate pill counting based on image analysis
         # This is a placeholder for the actual AI model
         
-        # Load image to get basic properties
+        # Use the already decoded image to get basic properties
         try:
-            image = cv2.imread(image_path)
             if image is not None:
                 height, width = image.shape[:2]
                 
@@ -101,9 +349,8 @@ class PillDetectionService:
                 base_count = max(1, detection_count)
                 
                 # Add some randomness for realistic demo
-                import random
-                random.seed(hash(image_path) % 1000)  # Deterministic for same image
-                variation = random.randint(-2, 3)
+                rng = random.Random(zlib.adler32(np.ascontiguousarray(image)) % 1000)  # Deterministic for same image
+                variation = rng.randint(-2, 3)
                 
                 return max(0, base_count + variation)
             else:
@@ -136,3 +383,35 @@ class PillDetectionService:
             
         except Exception:
             return False
+
+# Per-process services, one per quality level, used when inference runs in a process pool
+_worker_services: Dict[str, PillDetectionService] = {}
+
+def _get_worker_service(quality: str, model_path: str) -> PillDetectionService:
+    service = _worker_services.get(quality)
+    # A different path means the weights were hot-swapped; the old model is dropped
+    if service is None or service.model_path != model_path:
+        service = PillDetectionService(model_path=model_path)
+        _worker_services[quality] = service
+    return service
+
+def detect_pills_batch_in_worker(
+    images: List[ImageInput],
+    quality: str = "standard",
+    model_path: str = MODEL_PATH,
+    use_cache: bool = True
+) -> List[Dict[str, Any]]:
+    """Process-pool entry point; each worker process loads its own model on first use.
+    Results are compact so only flat lists are pickled back to the API process."""
+    return _get_worker_service(quality, model_path).detect_pills_batch(images, compact=True, use_cache=use_cache)
+
+def warm_up_in_worker(quality: str = "standard", model_path: str = MODEL_PATH, barrier=None):
+    """
+    Process-pool entry point that loads and warms up the worker's model
+
+    With a barrier sized to the pool, the call returns only once every worker
+    has loaded, so each worker runs exactly one of the pool-sized batch of calls.
+    """
+    _get_worker_service(quality, model_path).warm_up()
+    if barrier is not None:
+        barrier.wait(WORKER_WARM_UP_TIMEOUT_SECONDS)
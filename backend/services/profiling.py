@@ -0,0 +1,232 @@
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# X-Profile header value that profiles a single request; empty disables header-triggered profiling
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "50"))
+
+# Always-on sampling of the whole process at a low rate, kept as one profile per window
+CONTINUOUS_PROFILING = os.getenv("CONTINUOUS_PROFILING", "false").lower() in ("1", "true", "yes")
+CONTINUOUS_PROFILING_INTERVAL = float(os.getenv("CONTINUOUS_PROFILING_INTERVAL", "0.1"))
+CONTINUOUS_PROFILING_WINDOW = float(os.getenv("CONTINUOUS_PROFILING_WINDOW", "60"))
+
+# Profiler threads skip their own stacks
+PROFILER_THREAD_PREFIX = "profiler"
+
+class Profile(NamedTuple):
+    """Sampled stacks of every thread over one request or one continuous window"""
+    id: str
+    kind: str  # "request" or "continuous"
+    label: str
+    started_at: str
+    duration_s: float
+    samples: int
+    stacks: Dict[str, int]
+
+    def summary(self) -> Dict[str, object]:
+        return {key: value for key, value in self._asdict().items() if key != "stacks"}
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope, most frequent first"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]))
+
+def _collapse_stack(thread_name: str, frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join([thread_name] + frames[::-1])
+
+class StackSampler:
+    """
+    Statistical profiler sampling the stacks of all threads at a fixed interval
+
+    Unlike cProfile it costs nothing between samples and sees the inference
+    pool threads as well as the event loop. Asyncio interleaves requests on
+    the loop thread, so a per-request profile also contains whatever else the
+    process was doing meanwhile.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{PROFILER_THREAD_PREFIX}-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Record the current stack of every thread except the profiler's own"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = [
+            _collapse_stack(names.get(ident, str(ident)), frame)
+            for ident, frame in sys._current_frames().items()
+            if not names.get(ident, "").startswith(PROFILER_THREAD_PREFIX)
+        ]
+        with self._lock:
+            self._stacks.update(stacks)
+            self.samples += 1
+
+    def take(self) -> Tuple[int, Dict[str, int]]:
+        """Samples taken and stack counts so far; the sampler starts over from empty"""
+        with self._lock:
+            samples, stacks = self.samples, dict(self._stacks)
+            self._stacks, self.samples = Counter(), 0
+        return samples, stacks
+
+class ProfileStore:
+    """The most recent profiles, plus how many upcoming requests per path an admin asked to profile"""
+
+    def __init__(self, max_profiles: int = PROFILE_MAX_STORED):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._armed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Profile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+    def arm(self, path: str, count: int) -> int:
+        """Profile the next count requests to path; returns how many are now pending for it"""
+        with self._lock:
+            self._armed[path] = self._armed.get(path, 0) + count
+            return self._armed[path]
+
+    def take_armed(self, path: str) -> bool:
+        with self._lock:
+            remaining = self._armed.get(path, 0)
+            if remaining <= 0:
+                return False
+            if remaining == 1:
+                del self._armed[path]
+            else:
+                self._armed[path] = remaining - 1
+            return True
+
+    def armed(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._armed)
+
+profile_store = ProfileStore()
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling opted-in requests with a StackSampler
+
+    A request is profiled when it sends X-Profile equal to PROFILING_TOKEN,
+    or when an admin armed profiling for its path. The profile is stored in
+    the ProfileStore and its id returned in the X-Profile-Id response header.
+    """
+
+    def __init__(self, app, store: ProfileStore = profile_store, token: str = PROFILING_TOKEN):
+        self.app = app
+        self.store = store
+        self.token = token
+
+    def _should_profile(self, scope) -> bool:
+        if self.token:
+            for name, value in scope.get("headers", []):
+                if name == b"x-profile" and hmac.compare_digest(value, self.token.encode()):
+                    return True
+        return self.store.take_armed(scope["path"])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        started_at = datetime.now().isoformat()
+        sampler = StackSampler()
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            samples, stacks = sampler.take()
+            self.store.add(Profile(
+                profile_id, "request", f"{scope['method']} {scope['path']}", started_at,
+                time.perf_counter() - start, samples, stacks
+            ))
+
+class ContinuousProfiler:
+    """Low-rate sampling of the whole process, stored as one profile per window"""
+
+    def __init__(
+        self,
+        store: ProfileStore = profile_store,
+        interval: float = CONTINUOUS_PROFILING_INTERVAL,
+        window: float = CONTINUOUS_PROFILING_WINDOW
+    ):
+        self.store = store
+        self.window = window
+        self.sampler = StackSampler(interval)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self.sampler.start()
+        self._thread = threading.Thread(target=self._run, name=f"{PROFILER_THREAD_PREFIX}-windows", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sampler.stop()
+
+    def _run(self):
+        while True:
+            started_at, start = datetime.now().isoformat(), time.perf_counter()
+            stopped = self._stop.wait(self.window)
+            samples, stacks = self.sampler.take()
+            if samples:
+                self.store.add(Profile(
+                    uuid.uuid4().hex[:12], "continuous", "process", started_at,
+                    time.perf_counter() - start, samples, stacks
+                ))
+            if stopped:
+                return
@@ -0,0 +1,90 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, List, NamedTuple, Tuple
+
+import numpy as np
+
+# Decoded images at least this large are handed to workers through shared memory
+SHARED_MEMORY_MIN_BYTES = int(os.getenv("SHARED_MEMORY_MIN_BYTES", "65536"))
+
+class SharedImage(NamedTuple):
+    """Small, picklable reference to a decoded image copied into a shared memory block"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+class SharedMemoryProcessPoolExecutor(ProcessPoolExecutor):
+    """
+    Process pool that passes large image arguments through shared memory
+
+    Every list argument of a submitted call has its large arrays copied once
+    into shared memory; workers receive only block names and read the pixels
+    in place, so decoded images are never pickled through the pool's pipe.
+    Encoded uploads are compressed and decoded into a new array anyway, so
+    they are pickled as usual. Blocks are released when the call finishes.
+    """
+
+    def __init__(self, max_workers: int = None, min_bytes: int = SHARED_MEMORY_MIN_BYTES, **kwargs):
+        super().__init__(max_workers=max_workers, **kwargs)
+        self.min_bytes = min_bytes
+        # Workers must inherit this process's resource tracker; one started inside a
+        # worker would treat blocks it attached to as leaked and warn about them
+        resource_tracker.ensure_running()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        blocks: List[shared_memory.SharedMemory] = []
+        try:
+            shared_args = [
+                [_share(item, blocks, self.min_bytes) for item in arg] if isinstance(arg, list) else arg
+                for arg in args
+            ]
+            if not blocks:
+                return super().submit(fn, *args, **kwargs)
+            future = super().submit(_call_with_shared_images, fn, *shared_args, **kwargs)
+        except BaseException:
+            _release(blocks)
+            raise
+        future.add_done_callback(lambda _: _release(blocks))
+        return future
+
+def _share(item: Any, blocks: List[shared_memory.SharedMemory], min_bytes: int) -> Any:
+    """Copy a large decoded image into a new shared memory block and return its reference"""
+    if not isinstance(item, np.ndarray) or item.nbytes < min_bytes:
+        return item
+
+    block = shared_memory.SharedMemory(create=True, size=item.nbytes)
+    blocks.append(block)
+    np.ndarray(item.shape, dtype=item.dtype, buffer=block.buf)[...] = item
+    return SharedImage(block.name, item.shape, item.dtype.str)
+
+def _release(blocks: List[shared_memory.SharedMemory]):
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+def _call_with_shared_images(fn: Callable, *args, **kwargs) -> Any:
+    """Worker side: attach to shared images, run fn on them, then detach"""
+    attached = []
+    resolved_args = [
+        [_attach(item, attached) for item in arg] if isinstance(arg, list) else arg
+        for arg in args
+    ]
+    try:
+        return fn(*resolved_args, **kwargs)
+    finally:
+        # Drop the array views before closing, or the blocks cannot be unmapped
+        del resolved_args
+        for block in attached:
+            try:
+                block.close()
+            except BufferError:
+                pass  # still referenced; unmapped when the last view is collected
+
+def _attach(item: Any, attached: List[shared_memory.SharedMemory]) -> Any:
+    if not isinstance(item, SharedImage):
+        return item
+    # Registered with the API process's resource tracker, which forgets the block once it is unlinked
+    block = shared_memory.SharedMemory(name=item.name)
+    attached.append(block)
+    return np.ndarray(item.shape, dtype=np.dtype(item.dtype), buffer=block.buf)
@@ -0,0 +1,177 @@
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+# Per-worker thread configuration; 0 intra-op threads splits the CPU budget between workers
+INFERENCE_INTRA_OP_THREADS = int(os.getenv("INFERENCE_INTRA_OP_THREADS", "0"))
+INFERENCE_INTER_OP_THREADS = int(os.getenv("INFERENCE_INTER_OP_THREADS", "1"))
+OPENCV_THREADS = int(os.getenv("OPENCV_THREADS", "1"))
+
+# Cores this API process may use; 0 divides the machine between uvicorn workers (WEB_CONCURRENCY)
+INFERENCE_CPU_BUDGET = int(os.getenv("INFERENCE_CPU_BUDGET", "0"))
+
+# Startup auto-tuning of worker and thread counts, remembered per machine in INFERENCE_TUNING_FILE
+INFERENCE_AUTOTUNE = os.getenv("INFERENCE_AUTOTUNE", "false").lower() in ("1", "true", "yes")
+INFERENCE_TUNING_FILE = os.getenv("INFERENCE_TUNING_FILE", "inference_tuning.json")
+
+logger = logging.getLogger(__name__)
+
+class ThreadSettings(NamedTuple):
+    """How inference uses the CPU budget: worker count and threads inside each worker"""
+    workers: int
+    intra_op_threads: int
+    inter_op_threads: int
+    opencv_threads: int
+
+# Settings applied in this process, read by backends when they create sessions
+_current_settings: Optional[ThreadSettings] = None
+
+def cpu_budget() -> int:
+    """Cores available to this API process"""
+    if INFERENCE_CPU_BUDGET > 0:
+        return INFERENCE_CPU_BUDGET
+    try:
+        cores = len(os.sched_getaffinity(0))  # respects container CPU sets
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(1, cores // max(1, int(os.getenv("WEB_CONCURRENCY", "1"))))
+
+def default_thread_settings(workers: int) -> ThreadSettings:
+    """Configured settings; unset intra-op threads share the budget so workers do not oversubscribe cores"""
+    intra_op_threads = INFERENCE_INTRA_OP_THREADS or max(1, cpu_budget() // max(1, workers))
+    return ThreadSettings(workers, intra_op_threads, INFERENCE_INTER_OP_THREADS, OPENCV_THREADS)
+
+def current_thread_settings() -> Optional[ThreadSettings]:
+    return _current_settings
+
+def apply_thread_settings(settings: ThreadSettings):
+    """
+    Apply thread settings to this process
+
+    Also used as the process pool initializer, so each worker configures
+    itself before loading its model. Backends created afterwards read the
+    settings for their own thread pools.
+    """
+    global _current_settings
+    _current_settings = settings
+    cv2.setNumThreads(settings.opencv_threads)
+    configure_torch_threads(settings)
+
+def configure_torch_threads(settings: ThreadSettings):
+    """Size torch's thread pools if torch is loaded; the torch backend calls this after importing it"""
+    # Never imported here, so ONNX Runtime / OpenVINO deployments do not load torch
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    torch.set_num_threads(settings.intra_op_threads)
+    try:
+        torch.set_num_interop_threads(settings.inter_op_threads)
+    except RuntimeError:
+        pass  # can only be set before the first parallel work in a process
+
+def candidate_settings(budget: int, max_workers: Optional[int] = None) -> List[ThreadSettings]:
+    """Ways to split the CPU budget between workers and threads per worker"""
+    worker_counts = []
+    workers = 1
+    while workers <= min(budget, max_workers or budget):
+        worker_counts.append(workers)
+        workers *= 2
+    if budget not in worker_counts and budget <= (max_workers or budget):
+        worker_counts.append(budget)
+    return [
+        ThreadSettings(workers, max(1, budget // workers), INFERENCE_INTER_OP_THREADS, OPENCV_THREADS)
+        for workers in worker_counts
+    ]
+
+def autotune_thread_settings(
+    pool_type: str,
+    model_path: str,
+    candidates: Optional[List[ThreadSettings]] = None,
+    trial_images: int = 16,
+    image_size: int = 640
+) -> ThreadSettings:
+    """Measure detection throughput for each candidate on this machine and return the fastest"""
+    candidates = candidates or candidate_settings(cpu_budget())
+    images = [
+        np.random.default_rng(seed).integers(0, 255, (image_size, image_size, 3), dtype=np.uint8)
+        for seed in range(trial_images)
+    ]
+
+    best, best_throughput = candidates[0], 0.0
+    for settings in candidates:
+        throughput = _measure_throughput(settings, pool_type, model_path, images)
+        logger.info(
+            "Inference tuning: %d workers x %d threads -> %.1f images/s",
+            settings.workers, settings.intra_op_threads, throughput
+        )
+        if throughput > best_throughput:
+            best, best_throughput = settings, throughput
+    return best
+
+def _measure_throughput(settings: ThreadSettings, pool_type: str, model_path: str, images: List[np.ndarray]) -> float:
+    """Images per second with concurrent single-image requests, after warm-up"""
+    # Imported here: these modules load backends, which read settings from this one
+    from services.inference_scheduler import create_inference_executor
+    from services.pill_detection_service import (
+        PillDetectionService, detect_pills_batch_in_worker, warm_up_in_worker
+    )
+
+    executor = create_inference_executor(pool_type, settings.workers, thread_settings=settings)
+    try:
+        if pool_type == "process":
+            batch_fn = partial(detect_pills_batch_in_worker, quality="autotune", model_path=model_path)
+            # As in ModelRegistry warm-up, the barrier makes every worker load its model before timing starts
+            with multiprocessing.Manager() as manager:
+                barrier = manager.Barrier(settings.workers)
+                warm_ups = [
+                    executor.submit(warm_up_in_worker, "autotune", model_path, barrier)
+                    for _ in range(settings.workers)
+                ]
+                for future in warm_ups:
+                    future.result()
+        else:
+            apply_thread_settings(settings)
+            service = PillDetectionService(model_path=model_path)
+            service.warm_up()
+            batch_fn = partial(service.detect_pills_batch, compact=True)
+
+        start = time.perf_counter()
+        for future in [executor.submit(batch_fn, [image]) for image in images]:
+            future.result()
+        return len(images) / (time.perf_counter() - start)
+    finally:
+        executor.shutdown()
+
+def resolve_thread_settings(pool_type: str, workers: int, model_path: str) -> ThreadSettings:
+    """Settings to run with: configured values, or auto-tuned ones when INFERENCE_AUTOTUNE is set"""
+    # Spawned pool workers re-import the API module; they get the parent's settings
+    # from the pool initializer, so only the parent tunes
+    if not INFERENCE_AUTOTUNE or multiprocessing.parent_process() is not None:
+        return default_thread_settings(workers)
+
+    # Tuning takes a while, so results are kept per pool type, model and core count
+    key = f"{pool_type}:{model_path}:{cpu_budget()}"
+    tuned = _load_tuning_file()
+    if key in tuned:
+        return ThreadSettings(**tuned[key])
+
+    settings = autotune_thread_settings(pool_type, model_path)
+    tuned[key] = settings._asdict()
+    with open(INFERENCE_TUNING_FILE, "w") as tuning_file:
+        json.dump(tuned, tuning_file, indent=2)
+    return settings
+
+def _load_tuning_file() -> Dict[str, Dict[str, int]]:
+    try:
+        with open(INFERENCE_TUNING_FILE) as tuning_file:
+            return json.load(tuning_file)
+    except (OSError, ValueError):
+        return {}
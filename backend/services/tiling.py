@@ -0,0 +1,95 @@
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from services.inference_backends import Detections
+
+# Sliced inference configuration
+TILED_INFERENCE = os.getenv("TILED_INFERENCE", "false").lower() in ("1", "true", "yes")
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+MAX_TILES = int(os.getenv("MAX_TILES", "16"))
+TILE_MERGE_THRESHOLD = float(os.getenv("TILE_MERGE_THRESHOLD", "0.5"))
+
+def validate_tiling_config(tile_size: int, overlap: float, max_tiles: int):
+    """Raise ValueError for settings compute_tiles cannot work with"""
+    if tile_size < 1:
+        raise ValueError(f"Tile size must be at least 1 pixel, got {tile_size}")
+    # An overlap of 1 or more would never advance to the next tile
+    if not 0 <= overlap < 1:
+        raise ValueError(f"Tile overlap must be at least 0 and below 1, got {overlap}")
+    # Without at least one tile the grid could never shrink enough
+    if max_tiles < 1:
+        raise ValueError(f"Max tiles must be at least 1, got {max_tiles}")
+
+validate_tiling_config(TILE_SIZE, TILE_OVERLAP, MAX_TILES)
+
+def compute_tiles(height: int, width: int, tile_size: int, overlap: float, max_tiles: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Split an image into overlapping tiles
+
+    The tile size grows if the grid would need more than max_tiles tiles,
+    which caps latency for very large images.
+
+    Returns:
+        (x1, y1, x2, y2) pixel rectangles covering the whole image
+    """
+    validate_tiling_config(tile_size, overlap, max_tiles)
+    while True:
+        xs = _tile_starts(width, tile_size, overlap)
+        ys = _tile_starts(height, tile_size, overlap)
+        if len(xs) * len(ys) <= max_tiles:
+            break
+        tile_size = int(tile_size * 1.25) + 1
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in ys for x in xs
+    ]
+
+def _tile_starts(length: int, tile_size: int, overlap: float) -> List[int]:
+    """Start offsets along one axis; the last tile is aligned to the image edge"""
+    if length <= tile_size:
+        return [0]
+    step = max(1, int(tile_size * (1 - overlap)))
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+def merge_detections(
+    detections: List[Detections],
+    offsets: List[Tuple[int, int]],
+    match_threshold: float = TILE_MERGE_THRESHOLD
+) -> Detections:
+    """
+    Combine per-tile detections (at least one tile) into one set in full-image coordinates
+
+    Duplicates from overlapping tiles are suppressed with class-aware greedy NMS.
+    Overlap is measured as intersection over the smaller box, because an object
+    cut by a tile edge yields a partial box that a plain IoU would not match.
+    """
+    boxes = np.concatenate([
+        tile.boxes + np.array([x, y, x, y], dtype=np.float32)
+        for tile, (x, y) in zip(detections, offsets)
+    ])
+    confidences = np.concatenate([tile.confidences for tile in detections])
+    class_ids = np.concatenate([tile.class_ids for tile in detections])
+
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = confidences.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+
+        overlap_width = np.clip(np.minimum(boxes[best, 2], boxes[rest, 2]) - np.maximum(boxes[best, 0], boxes[rest, 0]), 0, None)
+        overlap_height = np.clip(np.minimum(boxes[best, 3], boxes[rest, 3]) - np.maximum(boxes[best, 1], boxes[rest, 1]), 0, None)
+        intersection = overlap_width * overlap_height
+        smaller_area = np.maximum(np.minimum(areas[best], areas[rest]), 1e-9)
+
+        duplicate = (intersection / smaller_area > match_threshold) & (class_ids[rest] == class_ids[best])
+        order = rest[~duplicate]
+
+    keep = np.array(keep, dtype=np.int64)
+    return Detections(boxes[keep], confidences[keep], class_ids[keep])
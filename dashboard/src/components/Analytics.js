@@ -27,6 +27,7 @@ import {
   Area,
 } from 'recharts';
 import axios from 'axios';
+import { fetchAllRecords } from '../services/recordsService';
 
 const COLORS = ['#0088FE', '#00C49F', '#FFBB28', '#FF8042', '#8884D8'];
 
@@ -43,12 +44,12 @@ function Analytics() {
   const loadAnalyticsData = async () => {
     try {
       setLoading(true);
-      const [recordsResponse, patientsResponse] = await Promise.all([
-        axios.get('/records'),
+      const [recordsData, patientsResponse] = await Promise.all([
+        fetchAllRecords(),
         axios.get('/patients'),
       ]);
 
-      setRecords(recordsResponse.data);
+      setRecords(recordsData);
       setPatients(patientsResponse.data);
     } catch (err) {
       console.error('Error loading analytics data:', err);
@@ -28,6 +28,7 @@ import {
   Warning as WarningIcon,
 } from '@mui/icons-material';
 import axios from 'axios';
+import { fetchAllRecords } from '../services/recordsService';
 
 const COLORS = ['#0088FE', '#00C49F', '#FFBB28', '#FF8042'];
 
@@ -50,12 +51,11 @@ function Dashboard() {
   const loadDashboardData = async () => {
     try {
       setLoading(true);
-      const [recordsResponse, patientsResponse] = await Promise.all([
-        axios.get('/records'),
+      const [recordsData, patientsResponse] = await Promise.all([
+        fetchAllRecords(),
         axios.get('/patients'),
       ]);
 
-      const recordsData = recordsResponse.data;
       const patientsData = patientsResponse.data;
 
       // Calculate statistics
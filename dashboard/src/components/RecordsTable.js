@@ -22,6 +22,7 @@ import {
   Refresh as RefreshIcon,
 } from '@mui/icons-material';
 import axios from 'axios';
+import { fetchRecordsPage } from '../services/recordsService';
 
 const columns = [
   { field: 'id', headerName: 'ID', width: 70 },
@@ -73,9 +74,14 @@ const columns = [
   },
 ];
 
+// Records load a page at a time (Load More fetches the next); the table shows every field
+const PAGE_SIZE = 100;
+
 function RecordsTable() {
   const [records, setRecords] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState(null);
   const [filteredRecords, setFilteredRecords] = useState([]);
   const [filters, setFilters] = useState({
@@ -98,8 +104,9 @@ function RecordsTable() {
   const loadRecords = async () => {
     try {
       setLoading(true);
-      const response = await axios.get('/records');
-      setRecords(response.data);
+      const page = await fetchRecordsPage({ limit: PAGE_SIZE });
+      setRecords(page.records);
+      setNextCursor(page.nextCursor);
     } catch (err) {
       console.error('Error loading records:', err);
       setError('Failed to load records. Please try again.');
@@ -108,6 +115,20 @@ function RecordsTable() {
     }
   };
 
+  const loadMoreRecords = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchRecordsPage({ limit: PAGE_SIZE }, nextCursor);
+      setRecords(current => [...current, ...page.records]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error('Error loading records:', err);
+      setError('Failed to load more records. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const applyFilters = () => {
     let filtered = [...records];
 
@@ -313,6 +334,18 @@ function RecordsTable() {
               }}
             />
           </div>
+
+          {nextCursor && (
+            <Box display="flex" justifyContent="center" mt={2}>
+              <Button
+                variant="outlined"
+                onClick={loadMoreRecords}
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Loading...' : 'Load More'}
+              </Button>
+            </Box>
+          )}
         </CardContent>
       </Card>
     </Box>
@@ -0,0 +1,24 @@
+import axios from 'axios';
+
+// Largest page /records serves (RECORDS_MAX_PAGE_SIZE on the backend)
+const PAGE_SIZE = 500;
+
+// /records returns one page at a time, with the cursor of the next page in X-Next-Cursor
+export const fetchRecordsPage = async (params = {}, cursor = null) => {
+  const response = await axios.get('/records', {
+    params: { limit: PAGE_SIZE, ...params, ...(cursor && { cursor }) },
+  });
+  return { records: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+};
+
+// Every matching record, following the cursors page by page
+export const fetchAllRecords = async (params = {}) => {
+  const records = [];
+  let cursor = null;
+  do {
+    const page = await fetchRecordsPage(params, cursor);
+    records.push(...page.records);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return records;
+};
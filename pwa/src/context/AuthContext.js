@@ -26,6 +26,7 @@ export const AuthProvider = ({ children }) => {
       } catch (error) {
         console.error('Error parsing user data:', error);
         localStorage.removeItem('authToken');
+        localStorage.removeItem('refreshToken');
         localStorage.removeItem('userData');
       }
     }
@@ -35,9 +36,12 @@ export const AuthProvider = ({ children }) => {
   const login = async (email, password) => {
     try {
       const response = await apiService.login(email, password);
-      const { token, ...userData } = response;
+      const { token, refresh_token: refreshToken, ...userData } = response;
       
       localStorage.setItem('authToken', token);
+      if (refreshToken) {
+        localStorage.setItem('refreshToken', refreshToken);
+      }
       localStorage.setItem('userData', JSON.stringify(userData));
       setUser(userData);
       
@@ -52,7 +56,13 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      // Best effort: offline logouts still end the session on this device
+      apiService.logout(refreshToken).catch(() => {});
+    }
     localStorage.removeItem('authToken');
+    localStorage.removeItem('refreshToken');
     localStorage.removeItem('userData');
     setUser(null);
   };
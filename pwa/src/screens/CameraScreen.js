@@ -53,7 +53,11 @@ const CameraScreen = () => {
 
     setLoading(true);
     try {
-      const result = await apiService.countPills(selectedImage);
+      // Show the quick preview count while the full analysis finishes
+      const result = await apiService.countPillsStream(selectedImage, (preview) => {
+        setAiResult({ ...preview, preview: true });
+        setManualCount(preview.pill_count.toString());
+      });
       setAiResult(result);
       setManualCount(result.pill_count.toString());
       toast.success('AI analysis completed!');
@@ -239,7 +243,7 @@ const CameraScreen = () => {
                 <div className="flex items-center mb-3">
                   <CheckCircle className="h-5 w-5 text-green-500 mr-2" />
                   <h3 className="text-lg font-semibold text-green-800">
-                    AI Analysis Complete
+                    {aiResult.preview ? 'Preliminary Count (refining...)' : 'AI Analysis Complete'}
                   </h3>
                 </div>
                 <div className="grid grid-cols-2 gap-4 mb-4">
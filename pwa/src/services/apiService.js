@@ -24,14 +24,72 @@ api.interceptors.request.use(
   }
 );
 
-// Add response interceptor to handle auth errors
+// /records returns one page at a time, with the cursor of the next page in X-Next-Cursor
+const RECORDS_PAGE_SIZE = 500;
+
+const getAllRecords = async (params = {}) => {
+  const records = [];
+  let cursor = null;
+  do {
+    const response = await api.get('/records', {
+      params: { limit: RECORDS_PAGE_SIZE, ...params, ...(cursor && { cursor }) },
+    });
+    records.push(...response.data);
+    cursor = response.headers['x-next-cursor'] || null;
+  } while (cursor);
+  return records;
+};
+
+const clearSession = () => {
+  localStorage.removeItem('authToken');
+  localStorage.removeItem('refreshToken');
+  localStorage.removeItem('userData');
+  window.location.href = '/login';
+};
+
+// One refresh at a time: refresh tokens rotate, so parallel refreshes (e.g. during
+// offline sync) would present an already used token and revoke the whole session
+let refreshInFlight = null;
+
+const refreshAccessToken = () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    return Promise.reject(new Error('No refresh token'));
+  }
+  if (!refreshInFlight) {
+    refreshInFlight = axios.post(`${API_BASE_URL}/token/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('authToken', response.data.token);
+        localStorage.setItem('refreshToken', response.data.refresh_token);
+        return response.data.token;
+      })
+      .finally(() => {
+        refreshInFlight = null;
+      });
+  }
+  return refreshInFlight;
+};
+
+// Add response interceptor to handle auth errors: an expired access token is
+// refreshed once and the request retried, so CHPs only log in again when the
+// refresh token itself is no longer valid
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response?.status === 401) {
-      localStorage.removeItem('authToken');
-      localStorage.removeItem('userData');
-      window.location.href = '/login';
+  async (error) => {
+    const request = error.config;
+    if (error.response?.status === 401 && request && !request._retried && request.url !== '/login') {
+      request._retried = true;
+      try {
+        const token = await refreshAccessToken();
+        request.headers.Authorization = `Bearer ${token}`;
+        return api(request);
+      } catch (refreshError) {
+        clearSession();
+        return Promise.reject(error);
+      }
+    }
+    if (error.response?.status === 401 && request?.url !== '/login') {
+      clearSession();
     }
     return Promise.reject(error);
   }
@@ -47,6 +105,11 @@ export const apiService = {
     return response.data;
   },
 
+  // Revoke the refresh token; the access token simply expires
+  logout: async (refreshToken) => {
+    await api.post('/logout', { refresh_token: refreshToken });
+  },
+
   // Barcode scanning
   scanBarcode: async (barcodeId) => {
     const formData = new FormData();
@@ -73,6 +136,53 @@ export const apiService = {
     return response.data;
   },
 
+  // Pill counting with a quick preview count streamed before the full result
+  countPillsStream: async (imageFile, onPreview) => {
+    const formData = new FormData();
+    formData.append('file', imageFile);
+
+    // axios cannot read a streamed response in the browser, so use fetch
+    const post = (token) => fetch(`${API_BASE_URL}/upload/stream`, {
+      method: 'POST',
+      headers: token ? { Authorization: `Bearer ${token}` } : {},
+      body: formData,
+    });
+    let response = await post(localStorage.getItem('authToken'));
+    if (response.status === 401) {
+      response = await post(await refreshAccessToken());
+    }
+    if (!response.ok) {
+      throw new Error(`Upload failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Server-Sent Events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const message = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        const event = message.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(message.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (event === 'preview' && onPreview) {
+          onPreview(data);
+        } else if (event === 'result') {
+          return data;
+        } else if (event === 'error') {
+          throw new Error(data.detail);
+        }
+      }
+    }
+    throw new Error('Upload stream ended without a result');
+  },
+
   // Submit count
   submitCount: async (data) => {
     const response = await api.post('/submit', data);
@@ -80,16 +190,10 @@ export const apiService = {
   },
 
   // Get history
-  getHistory: async (filters = {}) => {
-    const response = await api.get('/records', { params: filters });
-    return response.data;
-  },
+  getHistory: async (filters = {}) => getAllRecords(filters),
 
   // Get statistics
-  getStats: async () => {
-    const response = await api.get('/records');
-    return response.data;
-  },
+  getStats: async () => getAllRecords(),
 
   // Export data
   exportData: async (filters = {}) => {
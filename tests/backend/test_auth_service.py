@@ -1,9 +1,14 @@
 import pytest
+import threading
 from unittest.mock import Mock, patch
 from datetime import datetime, timedelta
 from jose import jwt
-from backend.services.auth_service import AuthService
-from backend.database.models import User
+from passlib.context import CryptContext
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.services.auth_service import AuthService, BCRYPT_ROUNDS, UserCache
+from backend.database.database import Base
+from backend.database.models import RefreshToken, User
 from backend.schemas.schemas import UserLogin, UserCreate
 
 
@@ -93,6 +98,37 @@ class TestAuthService:
         result = auth_service.authenticate_user(mock_db_session, "chp1@mms.org", "wrongpassword")
         assert result is None
 
+    @pytest.mark.asyncio
+    async def test_authenticate_user_async_runs_off_event_loop(self, auth_service, mock_user, mock_db_session):
+        """Test async login verifies the password on the password hashing threads - FR-001, NFR-002"""
+        mock_db_session.first.return_value = mock_user
+        verified_on = []
+        verify = auth_service.verify_and_update_password
+        
+        def record_thread(*args):
+            verified_on.append(threading.current_thread().name)
+            return verify(*args)
+        
+        with patch.object(auth_service, 'verify_and_update_password', side_effect=record_thread):
+            result = await auth_service.authenticate_user_async(mock_db_session, "chp1@mms.org", "password123")
+            rejected = await auth_service.authenticate_user_async(mock_db_session, "chp1@mms.org", "wrongpassword")
+        
+        assert result == mock_user
+        assert rejected is None
+        assert all(name.startswith("password-hash") for name in verified_on)
+    
+    def test_authenticate_user_rehashes_outdated_cost(self, auth_service, mock_user, mock_db_session):
+        """Test a hash made with another bcrypt cost is replaced on successful login - FR-001"""
+        mock_user.hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("password123")
+        mock_db_session.first.return_value = mock_user
+        
+        result = auth_service.authenticate_user(mock_db_session, "chp1@mms.org", "password123")
+        
+        assert result == mock_user
+        assert mock_user.hashed_password.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+        mock_db_session.commit.assert_called_once()
+        assert auth_service.verify_password("password123", mock_user.hashed_password) is True
+
     # FR-002: JWT token-based session management
     def test_create_access_token(self, auth_service):
         """Test JWT access token creation - FR-002"""
@@ -142,6 +178,26 @@ class TestAuthService:
         email = auth_service.verify_token(token)
         assert email is None
 
+    def test_verify_token_decodes_each_token_once(self, auth_service):
+        """Test a repeated token is answered from the decoded token cache - FR-002, NFR-002"""
+        token = auth_service.create_access_token({"sub": "chp1@mms.org"})
+        
+        with patch('backend.services.auth_service.jwt.decode', wraps=jwt.decode) as mock_decode:
+            assert auth_service.verify_token(token) == "chp1@mms.org"
+            assert auth_service.verify_token(token) == "chp1@mms.org"
+        
+        mock_decode.assert_called_once()
+    
+    def test_cached_token_still_expires(self, auth_service):
+        """Test a cached token is rejected once its expiry passes - FR-002"""
+        token = auth_service.create_access_token({"sub": "chp1@mms.org"}, timedelta(minutes=5))
+        assert auth_service.verify_token(token) == "chp1@mms.org"
+        
+        with patch('backend.services.auth_service.time.time', return_value=datetime.utcnow().timestamp() + 3600):
+            assert auth_service._decoded_tokens
+            with patch('backend.services.auth_service.jwt.decode', side_effect=jwt.ExpiredSignatureError):
+                assert auth_service.verify_token(token) is None
+
     # FR-003: Role-based access control (CHP, Admin)
     def test_get_current_user_chp(self, auth_service, mock_user, mock_db_session):
         """Test getting current CHP user - FR-003"""
@@ -183,6 +239,127 @@ class TestAuthService:
         result = auth_service.get_current_user(mock_db_session, token)
         assert result == mock_user  # Service should still return user, let API handle active check
 
+    def test_get_current_user_served_from_cache(self, auth_service, mock_user, mock_db_session):
+        """Test a recently resolved user is not queried again - FR-003, NFR-002"""
+        token = auth_service.create_access_token({"sub": "chp1@mms.org"})
+        mock_db_session.first.return_value = mock_user
+        
+        first = auth_service.get_current_user(mock_db_session, token)
+        second = auth_service.get_current_user(mock_db_session, token)
+        
+        assert first is second is mock_user
+        mock_db_session.query.assert_called_once()
+        mock_db_session.expunge.assert_called_once_with(mock_user)
+    
+    def test_user_cache_entries_expire(self, mock_user):
+        """Test cached users are dropped after the TTL - FR-003"""
+        cache = UserCache(ttl_seconds=10)
+        
+        with patch('backend.services.auth_service.time.monotonic', return_value=1000.0):
+            cache.set("chp1@mms.org", mock_user)
+        with patch('backend.services.auth_service.time.monotonic', return_value=1005.0):
+            assert cache.get("chp1@mms.org") is mock_user
+        with patch('backend.services.auth_service.time.monotonic', return_value=1011.0):
+            assert cache.get("chp1@mms.org") is None
+    
+    def test_deactivation_invalidates_cached_user(self, auth_service):
+        """Test deactivating a user takes effect on the next request despite the cache - FR-003, FR-005"""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine)
+        with SessionLocal() as db:
+            db.add(User(email="chp1@mms.org", name="CHP", hashed_password="x", role="chp", is_active=True))
+            db.commit()
+        token = auth_service.create_access_token({"sub": "chp1@mms.org"})
+        
+        with SessionLocal() as db:
+            assert auth_service.get_current_user(db, token).is_active is True
+        with SessionLocal() as db:
+            db.query(User).filter(User.email == "chp1@mms.org").first().is_active = False
+            db.commit()
+        with SessionLocal() as db:
+            assert auth_service.get_current_user(db, token).is_active is False
+
+    @pytest.fixture
+    def session_factory(self):
+        """Create an in-memory database with one active CHP"""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine)
+        with SessionLocal() as db:
+            db.add(User(email="chp1@mms.org", name="CHP", hashed_password="x", role="chp", is_active=True))
+            db.commit()
+        return SessionLocal
+    
+    def test_refresh_token_rotates(self, auth_service, session_factory):
+        """Test a refresh token is exchanged for a new one and cannot be used twice - FR-002"""
+        with session_factory() as db:
+            user = db.query(User).first()
+            refresh_token = auth_service.create_refresh_token(db, user)
+            
+            rotated_user, new_token = auth_service.rotate_refresh_token(db, refresh_token)
+            
+            assert rotated_user.email == "chp1@mms.org"
+            assert new_token != refresh_token
+            assert db.query(RefreshToken).filter(RefreshToken.token_hash == refresh_token).first() is None  # only hashes stored
+    
+    def test_refresh_token_reuse_revokes_session(self, auth_service, session_factory):
+        """Test replaying a used refresh token revokes every token from that login - FR-002, FR-004"""
+        with session_factory() as db:
+            refresh_token = auth_service.create_refresh_token(db, db.query(User).first())
+            _, new_token = auth_service.rotate_refresh_token(db, refresh_token)
+            
+            assert auth_service.rotate_refresh_token(db, refresh_token) is None
+            assert auth_service.rotate_refresh_token(db, new_token) is None
+    
+    def test_concurrent_refresh_with_same_token_detected_as_reuse(self, auth_service, tmp_path):
+        """Test two refreshes racing with one token cannot both succeed - FR-002, FR-004"""
+        # A database file, so each session has its own connection like concurrent requests
+        engine = create_engine(f"sqlite:///{tmp_path / 'tokens.db'}")
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine)
+        with SessionLocal() as db:
+            db.add(User(email="chp1@mms.org", name="CHP", hashed_password="x", role="chp", is_active=True))
+            db.commit()
+        
+        with SessionLocal() as first, SessionLocal() as second:
+            refresh_token = auth_service.create_refresh_token(first, first.query(User).first())
+            # The first request has loaded the token, still unused, when the second one rotates it
+            loaded = first.query(RefreshToken).one()
+            _, rotated = auth_service.rotate_refresh_token(second, refresh_token)
+            
+            assert loaded.revoked is False
+            assert auth_service.rotate_refresh_token(first, refresh_token) is None
+            assert auth_service.rotate_refresh_token(second, rotated) is None  # whole login revoked
+    
+    def test_refresh_prunes_expired_and_logout_deletes_tokens(self, auth_service, session_factory):
+        """Test expired refresh tokens and logged-out logins do not stay in the table - FR-004"""
+        with session_factory() as db:
+            user = db.query(User).first()
+            auth_service.create_refresh_token(db, user)
+            db.query(RefreshToken).update({"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+            db.commit()
+            
+            _, rotated = auth_service.rotate_refresh_token(db, auth_service.create_refresh_token(db, user))
+            assert db.query(RefreshToken).count() == 2  # the used token is kept to detect replays
+            
+            auth_service.revoke_refresh_token(db, rotated)
+            assert db.query(RefreshToken).count() == 0
+    
+    def test_refresh_token_rejected_when_expired_or_revoked(self, auth_service, session_factory):
+        """Test expired, logged-out and unknown refresh tokens are rejected - FR-002, FR-004"""
+        with session_factory() as db:
+            user = db.query(User).first()
+            expired = auth_service.create_refresh_token(db, user)
+            db.query(RefreshToken).update({"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+            db.commit()
+            logged_out = auth_service.create_refresh_token(db, user)
+            auth_service.revoke_refresh_token(db, logged_out)
+            
+            assert auth_service.rotate_refresh_token(db, expired) is None
+            assert auth_service.rotate_refresh_token(db, logged_out) is None
+            assert auth_service.rotate_refresh_token(db, "not-a-token") is None
+
     # FR-004: Secure logout with session termination
     def test_token_expiration_after_logout(self, auth_service):
         """Test that tokens expire after logout time - FR-004"""
@@ -0,0 +1,55 @@
+import pytest
+from unittest.mock import patch
+from backend.services.detection_cache import DetectionCache
+
+
+class TestDetectionCache:
+    """Test cases for DetectionCache - Requirements: NFR-002, NFR-012"""
+    
+    @pytest.fixture
+    def result(self):
+        """Create a detection result for caching"""
+        return {"count": 12, "confidence": 0.9, "bounding_boxes": [], "raw_detections": 12}
+
+    def test_miss_then_hit(self, result):
+        """Test a stored result is served on the next lookup - NFR-002"""
+        cache = DetectionCache(max_entries=4, ttl_seconds=60)
+        
+        assert cache.get("key") is None
+        cache.set("key", result)
+        
+        assert cache.get("key") == result
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hit_rate"] == 0.5
+    
+    def test_lru_eviction(self, result):
+        """Test the least recently used entry is evicted past max_entries - NFR-002"""
+        cache = DetectionCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", result)
+        cache.set("b", result)
+        cache.get("a")
+        cache.set("c", result)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == result
+        assert cache.get("c") == result
+    
+    def test_ttl_expiry(self, result):
+        """Test results older than the TTL are not served - NFR-002"""
+        cache = DetectionCache(max_entries=4, ttl_seconds=10)
+        
+        with patch('backend.services.detection_cache.time.time', return_value=1000.0):
+            cache.set("key", result)
+        with patch('backend.services.detection_cache.time.time', return_value=1011.0):
+            assert cache.get("key") is None
+    
+    def test_persistent_store_survives_restart(self, result, tmp_path):
+        """Test results persisted to SQLite are found by a new cache instance - NFR-012"""
+        db_path = str(tmp_path / "cache.db")
+        DetectionCache(db_path=db_path).set("key", result)
+        
+        restarted = DetectionCache(db_path=db_path)
+        
+        assert restarted.get("key") == result
+        assert restarted.stats()["persistent"] is True
@@ -0,0 +1,76 @@
+import io
+import pytest
+import numpy as np
+from PIL import Image
+from backend.services.image_preprocessing import make_preview_image, preprocess_image_bytes
+
+
+class TestImagePreprocessing:
+    """Test cases for upload decoding before inference - Requirements: NFR-002"""
+    
+    @staticmethod
+    def _encode(image, format='JPEG', **params):
+        buffer = io.BytesIO()
+        image.save(buffer, format=format, **params)
+        return buffer.getvalue()
+    
+    def test_jpeg_decoded_near_target_size(self):
+        """Test large JPEGs are decoded at reduced size, never below the target - NFR-002"""
+        data = self._encode(Image.new('RGB', (4000, 3000), color='white'))
+        
+        prepared = preprocess_image_bytes(data, target_size=640)
+        
+        assert prepared.image.shape == (750, 1000, 3)  # 1/4 scale
+        assert prepared.scale == 4.0
+        assert prepared.original_size == (4000, 3000)
+    
+    def test_full_resolution_without_target(self):
+        """Test decoding keeps every pixel when no target size is given - FR-014"""
+        data = self._encode(Image.new('RGB', (1200, 800), color='white'))
+        
+        prepared = preprocess_image_bytes(data, target_size=None)
+        
+        assert prepared.image.shape == (800, 1200, 3)
+        assert prepared.scale == 1.0
+    
+    def test_png_not_reduced(self):
+        """Test formats without reduced decoding are returned at full size - NFR-002"""
+        data = self._encode(Image.new('RGB', (1600, 1200), color='white'), format='PNG')
+        
+        prepared = preprocess_image_bytes(data, target_size=640)
+        
+        assert prepared.image.shape == (1200, 1600, 3)
+        assert prepared.scale == 1.0
+    
+    def test_exif_orientation_applied(self):
+        """Test rotated phone photos are decoded upright - FR-011"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotate 90 degrees clockwise on display
+        data = self._encode(Image.new('RGB', (2560, 1920), color='white'), exif=exif)
+        
+        prepared = preprocess_image_bytes(data, target_size=640)
+        
+        assert prepared.image.shape == (1280, 960, 3)
+        assert prepared.original_size == (1920, 2560)
+        assert prepared.scale == 2.0
+    
+    def test_output_is_bgr(self):
+        """Test decoded arrays use OpenCV channel order - NFR-002"""
+        data = self._encode(Image.new('RGB', (64, 64), color=(255, 0, 0)), format='PNG')
+        
+        prepared = preprocess_image_bytes(data)
+        
+        assert tuple(prepared.image[0, 0]) == (0, 0, 255)
+    
+    def test_invalid_bytes_raise_value_error(self):
+        """Test undecodable uploads raise ValueError - FR-011"""
+        with pytest.raises(ValueError):
+            preprocess_image_bytes(b"not an image")
+    
+    def test_preview_image_downscaled(self):
+        """Test previews are small images keeping the aspect ratio - NFR-002"""
+        data = self._encode(Image.new('RGB', (4000, 3000), color='white'))
+        
+        preview = make_preview_image(data, size=320)
+        
+        assert preview.shape == (240, 320, 3)
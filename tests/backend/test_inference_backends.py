@@ -0,0 +1,64 @@
+import pytest
+import numpy as np
+from backend.services.inference_backends import (
+    Detections, create_backend, _letterbox, _postprocess_yolov8
+)
+
+
+class TestInferenceBackends:
+    """Test cases for pluggable inference backends - Requirements: FR-014, NFR-002"""
+    
+    @staticmethod
+    def _raw_output(predictions, num_classes=2, anchors=8):
+        """Build a raw YOLOv8 output (4 + classes, anchors) from (cx, cy, w, h, class_id, score) rows"""
+        output = np.zeros((4 + num_classes, anchors), dtype=np.float32)
+        for anchor, (cx, cy, w, h, class_id, score) in enumerate(predictions):
+            output[:4, anchor] = [cx, cy, w, h]
+            output[4 + class_id, anchor] = score
+        return output
+
+    def test_letterbox_keeps_aspect_ratio(self):
+        """Test letterboxing pads instead of stretching - FR-014"""
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+        
+        padded, ratio, (pad_x, pad_y) = _letterbox(image, 640)
+        
+        assert padded.shape == (640, 640, 3)
+        assert ratio == 1.0
+        assert (pad_x, pad_y) == (0, 80)
+    
+    def test_postprocess_maps_boxes_to_original_image(self):
+        """Test boxes are scaled back and overlapping duplicates suppressed - FR-014"""
+        output = self._raw_output([
+            (320, 320, 100, 100, 0, 0.9),
+            (322, 322, 100, 100, 0, 0.8),  # duplicate of the first box
+            (100, 100, 20, 20, 1, 0.7),
+            (500, 500, 20, 20, 1, 0.2),  # below threshold
+        ])
+        
+        detections = _postprocess_yolov8(output, (1280, 1280), 0.5, (0, 0), 0.5, 0.45)
+        
+        assert isinstance(detections, Detections)
+        assert len(detections.confidences) == 2
+        np.testing.assert_allclose(detections.boxes[0], [540, 540, 740, 740])
+        assert detections.class_ids.tolist() == [0, 1]
+    
+    def test_postprocess_no_detections(self):
+        """Test an output with nothing above threshold yields empty arrays - FR-014"""
+        output = self._raw_output([(320, 320, 100, 100, 0, 0.1)])
+        
+        detections = _postprocess_yolov8(output, (640, 640), 1.0, (0, 0), 0.5, 0.45)
+        
+        assert detections.boxes.shape == (0, 4)
+    
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected - NFR-011"""
+        with pytest.raises(ValueError):
+            create_backend("tensorrt", "yolov8n.pt")
+    
+    def test_int8_requires_onnx_backend(self):
+        """Test INT8 precision is only accepted for the ONNX Runtime backend - NFR-002"""
+        with pytest.raises(ValueError):
+            create_backend("torch", "yolov8n.pt", "int8")
+        with pytest.raises(ValueError):
+            create_backend("onnx", "yolov8n.onnx", "fp16")
@@ -0,0 +1,119 @@
+import pytest
+import asyncio
+import threading
+from unittest.mock import Mock
+from backend.services.inference_scheduler import (
+    InferenceScheduler, InferenceQueueFullError, InferenceTimeoutError
+)
+
+
+class TestInferenceScheduler:
+    """Test cases for InferenceScheduler - Requirements: NFR-002, NFR-004"""
+    
+    @pytest.fixture
+    def batch_fn(self):
+        """Create a batch function that echoes its inputs"""
+        return Mock(side_effect=lambda images: [{"count": len(image)} for image in images])
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_batch(self, batch_fn):
+        """Test requests arriving within the window are dispatched together - NFR-004"""
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=8, batch_window_ms=50)
+        
+        results = await asyncio.gather(*[scheduler.submit("x" * n) for n in range(1, 5)])
+        await scheduler.shutdown()
+        
+        assert [r["count"] for r in results] == [1, 2, 3, 4]
+        batch_fn.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_batches_capped_at_max_size(self, batch_fn):
+        """Test a burst larger than max_batch_size is split into several batches - NFR-002"""
+        scheduler = InferenceScheduler(batch_fn, max_batch_size=2, batch_window_ms=50)
+        
+        results = await asyncio.gather(*[scheduler.submit("x") for _ in range(5)])
+        await scheduler.shutdown()
+        
+        assert len(results) == 5
+        assert batch_fn.call_count == 3
+        assert all(len(call.args[0]) <= 2 for call in batch_fn.call_args_list)
+    
+    @pytest.mark.asyncio
+    async def test_batch_failure_propagates_to_callers(self):
+        """Test every waiting request sees the batch error - NFR-011"""
+        scheduler = InferenceScheduler(Mock(side_effect=RuntimeError("boom")), batch_window_ms=10)
+        
+        with pytest.raises(RuntimeError):
+            await scheduler.submit("x")
+        await scheduler.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_queue_full_rejects_new_requests(self):
+        """Test backpressure when the bounded queue is full - NFR-004"""
+        release = threading.Event()
+        scheduler = InferenceScheduler(
+            Mock(side_effect=lambda images: [{} for _ in images if release.wait()]),
+            max_batch_size=1, batch_window_ms=0, max_workers=1, max_queue_size=1
+        )
+        
+        running = asyncio.ensure_future(scheduler.submit("a"))
+        await asyncio.sleep(0.05)  # first request is now occupying the only worker
+        queued = asyncio.ensure_future(scheduler.submit("b"))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(InferenceQueueFullError):
+            await scheduler.submit("c")
+        
+        release.set()
+        await asyncio.gather(running, queued)
+        await scheduler.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_request_timeout(self):
+        """Test a request that waits too long fails with a timeout - NFR-002"""
+        release = threading.Event()
+        scheduler = InferenceScheduler(
+            Mock(side_effect=lambda images: [{} for _ in images if release.wait()]),
+            batch_window_ms=0, timeout_seconds=0.05
+        )
+        
+        with pytest.raises(InferenceTimeoutError):
+            await scheduler.submit("a")
+        
+        release.set()
+        await scheduler.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_run_batch_uses_worker_pool(self, batch_fn):
+        """Test a pre-formed batch runs in one call off the event loop - NFR-002"""
+        scheduler = InferenceScheduler(batch_fn)
+        
+        results = await scheduler.run_batch(["a", "bb", "ccc"])
+        await scheduler.shutdown()
+        
+        assert [r["count"] for r in results] == [1, 2, 3]
+        batch_fn.assert_called_once_with(["a", "bb", "ccc"])
+    
+    @pytest.mark.asyncio
+    async def test_waiting_batches_count_against_queue_limit(self):
+        """Test batches waiting for a busy worker are rejected once the queue limit is reached - NFR-004"""
+        release = threading.Event()
+        scheduler = InferenceScheduler(
+            Mock(side_effect=lambda images: [{} for _ in images if release.wait()]),
+            max_workers=1, max_queue_size=2
+        )
+        
+        batches = [asyncio.ensure_future(scheduler.run_batch(["a"])) for _ in range(2)]
+        await asyncio.sleep(0.05)  # one batch runs, the other waits for the worker
+        
+        try:
+            with pytest.raises(InferenceQueueFullError):
+                await scheduler.run_batch(["b"])
+            with pytest.raises(InferenceQueueFullError):
+                await scheduler.submit("c")
+        finally:
+            release.set()
+        await asyncio.gather(*batches)
+        
+        assert await scheduler.run_batch(["d"]) == [{}]
+        await scheduler.shutdown()
@@ -79,6 +79,24 @@ class TestMainAPI:
         assert response.status_code == 200
         assert response.json() == {"status": "healthy"}
 
+    def test_readiness_before_warm_up(self, client):
+        """Test readiness reports 503 until the model is warm - NFR-010"""
+        with patch.object(app.state, 'model_warm_up', None, create=True):
+            response = client.get("/ready")
+            assert response.status_code == 503
+    
+    def test_readiness_after_warm_up(self):
+        """Test readiness succeeds once startup warm-up finishes - NFR-010"""
+        with patch('backend.main.pill_detection_service.warm_up') as mock_warm_up:
+            with TestClient(app) as client:
+                response = client.get("/ready")
+                while response.status_code == 503:
+                    response = client.get("/ready")
+            
+            assert response.status_code == 200
+            assert response.json()["status"] == "ready"
+            mock_warm_up.assert_called_once()
+
     # Authentication Tests (FR-001, FR-002, FR-003, FR-004, FR-005)
     def test_login_valid_credentials(self, client, mock_db_session):
         """Test login with valid credentials - FR-001"""
@@ -115,6 +133,23 @@ class TestMainAPI:
                 assert response.status_code == 401
                 assert "Incorrect email or password" in response.json()["detail"]
     
+    def test_refresh_token_invalid(self, client):
+        """Test an unknown refresh token does not issue an access token - FR-002"""
+        with patch.object(AuthService, 'rotate_refresh_token', return_value=None):
+            response = client.post("/token/refresh", json={"refresh_token": "stale"})
+        
+        assert response.status_code == 401
+    
+    def test_refresh_token_issues_new_tokens(self, client):
+        """Test a valid refresh token returns a new access token and rotated refresh token - FR-002"""
+        user = Mock(email="chp1@mms.org")
+        with patch.object(AuthService, 'rotate_refresh_token', return_value=(user, "rotated")):
+            response = client.post("/token/refresh", json={"refresh_token": "current"})
+        
+        assert response.status_code == 200
+        assert response.json()["refresh_token"] == "rotated"
+        assert AuthService().verify_token(response.json()["token"]) == "chp1@mms.org"
+    
     def test_login_missing_credentials(self, client):
         """Test login with missing credentials - FR-001"""
         response = client.post("/login", json={})
@@ -234,6 +269,172 @@ class TestMainAPI:
             # Should still work but might be slower
             assert response.status_code in [200, 413]  # 413 if size limit enforced
 
+    @patch('backend.main.inference_scheduler.batch_fn')
+    def test_upload_images_batch(self, mock_detect_batch, client, valid_token, mock_image):
+        """Test batch upload returns one result per image - FR-014, NFR-002"""
+        mock_detect_batch.return_value = [
+            {"count": 12, "confidence": 0.9, "boxes": [], "confidences": [], "class_ids": [], "raw_detections": 12},
+            {"count": 7, "confidence": 0.8, "boxes": [], "confidences": [], "class_ids": [], "raw_detections": 7},
+        ]
+        
+        with patch.object(AuthService, 'get_current_user', return_value=Mock()):
+            response = client.post(
+                "/upload/batch",
+                headers={"Authorization": f"Bearer {valid_token}"},
+                files=[
+                    ("files", ("a.jpg", mock_image.getvalue(), "image/jpeg")),
+                    ("files", ("b.jpg", mock_image.getvalue(), "image/jpeg")),
+                ]
+            )
+            
+            assert response.status_code == 200
+            assert [r["pill_count"] for r in response.json()] == [12, 7]
+            mock_detect_batch.assert_called_once()
+    
+    @patch('backend.main.inference_scheduler.batch_fn')
+    def test_upload_image_compact_format(self, mock_detect_batch, client, valid_token, mock_image):
+        """Test compact responses carry detections as parallel arrays - FR-017"""
+        mock_detect_batch.return_value = [{
+            "count": 2, "confidence": 0.85, "raw_detections": 2,
+            "boxes": [[1.0, 2.0, 3.0, 4.0], [5.0, 6.0, 7.0, 8.0]],
+            "confidences": [0.9, 0.8], "class_ids": [0, 0]
+        }]
+        
+        with patch.object(AuthService, 'get_current_user', return_value=Mock()):
+            response = client.post(
+                "/upload?compact=true",
+                headers={"Authorization": f"Bearer {valid_token}"},
+                files={"file": ("a.jpg", mock_image.getvalue(), "image/jpeg")}
+            )
+            
+            assert response.status_code == 200
+            data = response.json()
+            assert data["boxes"][1] == [5.0, 6.0, 7.0, 8.0]
+            assert data["confidences"] == [0.9, 0.8]
+            assert "bounding_boxes" not in data
+    
+    def test_metrics_endpoint(self, client):
+        """Test /metrics exposes request counts and latency histograms per route - NFR-001"""
+        client.get("/health")
+        
+        response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_requests_total{method="GET",route="/health",status="200"}' in response.text
+        assert "# TYPE upload_stage_duration_seconds histogram" in response.text
+    
+    def test_inactive_user_rejected(self, client, valid_token):
+        """Test a deactivated user's token no longer grants access - FR-003, FR-005"""
+        with patch.object(AuthService, 'get_current_user', return_value=Mock(is_active=False)):
+            response = client.get("/models", headers={"Authorization": f"Bearer {valid_token}"})
+        
+        assert response.status_code == 403
+    
+    def test_model_endpoints_require_admin(self, client, valid_token):
+        """Test only admins can list or hot-swap detection models or read cache stats - FR-003"""
+        headers = {"Authorization": f"Bearer {valid_token}"}
+        with patch.object(AuthService, 'get_current_user', return_value=Mock(role="chp")):
+            assert client.get("/models", headers=headers).status_code == 403
+            response = client.put("/models/standard", headers=headers, json={"weights_path": "/tmp/evil.pt"})
+            assert response.status_code == 403
+            assert client.get("/cache/stats", headers=headers).status_code == 403
+        
+        with patch.object(AuthService, 'get_current_user', return_value=Mock(role="admin")):
+            response = client.put("/models/standard", headers=headers, json={"weights_path": "/tmp/evil.pt"})
+            assert response.status_code == 400
+            assert "weights directory" in response.json()["detail"]
+    
+    def test_profile_endpoints_require_admin(self, client, valid_token, admin_token):
+        """Test only admins can arm and read request profiles - NFR-001"""
+        with patch.object(AuthService, 'get_current_user', return_value=Mock(role="chp")):
+            response = client.post(
+                "/admin/profiles/arm",
+                headers={"Authorization": f"Bearer {valid_token}"},
+                json={"path": "/upload", "count": 2}
+            )
+            assert response.status_code == 403
+        
+        with patch.object(AuthService, 'get_current_user', return_value=Mock(role="admin")):
+            response = client.post(
+                "/admin/profiles/arm",
+                headers={"Authorization": f"Bearer {admin_token}"},
+                json={"path": "/nothing-here", "count": 2}
+            )
+            assert response.status_code == 200
+            assert response.json()["pending"] >= 2
+            
+            response = client.get("/admin/profiles/missing", headers={"Authorization": f"Bearer {admin_token}"})
+            assert response.status_code == 404
+    
+    def test_upload_image_unknown_quality(self, client, valid_token, mock_image):
+        """Test asking for an unconfigured model quality returns 400 - FR-014"""
+        with patch.object(AuthService, 'get_current_user', return_value=Mock()):
+            response = client.post(
+                "/upload?quality=ultra",
+                headers={"Authorization": f"Bearer {valid_token}"},
+                files={"file": ("a.jpg", mock_image.getvalue(), "image/jpeg")}
+            )
+            
+            assert response.status_code == 400
+    
+    def test_upload_stream_sends_preview_then_result(self, client, valid_token, mock_image):
+        """Test the streaming upload sends a quick preview count before the full result - FR-014, NFR-002"""
+        def detect(images):
+            # The preview pass gets a decoded, downscaled array; the full pass gets the upload bytes
+            return [
+                {"count": 3 if isinstance(image, np.ndarray) else 12, "confidence": 0.8,
+                 "boxes": [], "confidences": [], "class_ids": [], "raw_detections": 0}
+                for image in images
+            ]
+        
+        with patch.object(AuthService, 'get_current_user', return_value=Mock()), \
+                patch('backend.main.inference_scheduler.batch_fn', side_effect=detect), \
+                patch('backend.main.pill_detection_service.tiled_inference', True):
+            response = client.post(
+                "/upload/stream",
+                headers={"Authorization": f"Bearer {valid_token}"},
+                files={"file": ("a.jpg", mock_image.getvalue(), "image/jpeg")}
+            )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        assert [lines[0] for lines in events] == ["event: preview", "event: result"]
+        assert json.loads(events[0][1][len("data: "):])["pill_count"] == 3
+        assert json.loads(events[1][1][len("data: "):])["pill_count"] == 12
+    
+    @patch('backend.main.inference_scheduler.batch_fn')
+    def test_upload_stream_skips_redundant_preview(self, mock_detect_batch, client, valid_token, mock_image):
+        """Test no preview is sent when it would cost as much as the full pass - NFR-002"""
+        mock_detect_batch.return_value = [
+            {"count": 5, "confidence": 0.9, "boxes": [], "confidences": [], "class_ids": [], "raw_detections": 5}
+        ]
+        
+        with patch.object(AuthService, 'get_current_user', return_value=Mock()):
+            response = client.post(
+                "/upload/stream",
+                headers={"Authorization": f"Bearer {valid_token}"},
+                files={"file": ("a.jpg", mock_image.getvalue(), "image/jpeg")}
+            )
+        
+        assert response.text.startswith("event: result")
+        mock_detect_batch.assert_called_once()
+    
+    def test_upload_images_batch_rejects_non_images(self, client, valid_token, mock_image):
+        """Test batch upload rejects non-image files - FR-011"""
+        with patch.object(AuthService, 'get_current_user', return_value=Mock()):
+            response = client.post(
+                "/upload/batch",
+                headers={"Authorization": f"Bearer {valid_token}"},
+                files=[
+                    ("files", ("a.jpg", mock_image.getvalue(), "image/jpeg")),
+                    ("files", ("b.txt", b"not an image", "text/plain")),
+                ]
+            )
+            
+            assert response.status_code == 400
+
     # Record Management Tests (FR-023, FR-025, FR-026)
     def test_get_records_unauthorized(self, client):
         """Test get records without authentication - FR-023"""
@@ -267,6 +468,43 @@ class TestMainAPI:
             assert len(data) == 1
             assert data[0]["pill_count"] == 25
     
+    def test_get_records_paginated_with_selected_fields(self, client, valid_token):
+        """Test /records pages with X-Next-Cursor and returns only the requested fields - FR-025"""
+        from datetime import datetime
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import StaticPool
+        from backend.database.models import Base, Record
+        
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add_all([
+            Record(patient_id=1, supplement_id=1, pill_count=count, source="ai", timestamp=datetime(2024, 1, count))
+            for count in range(1, 6)
+        ])
+        session.commit()
+        
+        app.dependency_overrides[get_db] = lambda: session
+        try:
+            with patch.object(AuthService, 'get_current_user', return_value=Mock(is_active=True)):
+                headers = {"Authorization": f"Bearer {valid_token}"}
+                first = client.get("/records", params={"limit": 3, "fields": "pill_count,source"}, headers=headers)
+                second = client.get(
+                    "/records",
+                    params={"limit": 3, "fields": "pill_count,source", "cursor": first.headers["x-next-cursor"]},
+                    headers=headers
+                )
+                invalid = client.get("/records", params={"fields": "pill_count,password"}, headers=headers)
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            session.close()
+        
+        assert first.json() == [{"pill_count": count, "source": "ai"} for count in (5, 4, 3)]
+        assert second.json() == [{"pill_count": count, "source": "ai"} for count in (2, 1)]
+        assert "x-next-cursor" not in second.headers
+        assert invalid.status_code == 400
+    
     def test_create_record_unauthorized(self, client):
         """Test create record without authentication - FR-023"""
         response = client.post("/records", json={})
@@ -0,0 +1,81 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from backend.services import metrics
+from backend.services.metrics import Counter, Histogram, MetricsMiddleware, instrument_engine, record_upload_stages
+
+
+class TestMetrics:
+    """Test cases for the Prometheus metrics - Requirements: NFR-001, NFR-002"""
+
+    @pytest.fixture
+    def client(self):
+        """Create an app with one templated route behind the metrics middleware"""
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: str):
+            return {"item_id": item_id}
+
+        return TestClient(app)
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """Test observations land in cumulative le buckets with sum and count - NFR-001"""
+        histogram = Histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="decode")
+        histogram.observe(0.1, stage="decode")
+        histogram.observe(3.0, stage="decode")
+
+        lines = histogram.render()
+
+        assert "# TYPE stage_seconds histogram" in lines
+        assert 'stage_seconds_bucket{stage="decode",le="0.1"} 2' in lines
+        assert 'stage_seconds_bucket{stage="decode",le="1"} 2' in lines
+        assert 'stage_seconds_bucket{stage="decode",le="+Inf"} 3' in lines
+        assert 'stage_seconds_sum{stage="decode"} 3.150000' in lines
+        assert 'stage_seconds_count{stage="decode"} 3' in lines
+
+    def test_counter_escapes_label_values(self):
+        """Test label values are escaped in the text format - NFR-001"""
+        counter = Counter("requests_total", "Requests", ("route",))
+        counter.inc(route='/a"b')
+        counter.inc(2, route='/a"b')
+
+        assert 'requests_total{route="/a\\"b"} 3' in counter.render()
+
+    def test_middleware_labels_requests_by_route_template(self, client):
+        """Test requests are counted per path template and status, not per URL - NFR-001"""
+        before = metrics.HTTP_REQUESTS.value(method="GET", route="/items/{item_id}", status=200)
+
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+
+        assert metrics.HTTP_REQUESTS.value(method="GET", route="/items/{item_id}", status=200) == before + 2
+        assert metrics.HTTP_REQUESTS.value(method="GET", route="unmatched", status=404) >= 1
+        assert metrics.HTTP_REQUEST_DURATION.count(method="GET", route="/items/{item_id}") >= 2
+
+    def test_engine_queries_are_timed(self):
+        """Test SQL statements are timed by statement type - NFR-002"""
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        before = metrics.DB_QUERY_DURATION.count(operation="SELECT")
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+        assert metrics.DB_QUERY_DURATION.count(operation="SELECT") == before + 1
+
+    def test_upload_stages_include_queue_time(self):
+        """Test the detection wait not spent in the worker is recorded as queue time - NFR-002"""
+        before = metrics.UPLOAD_STAGE_DURATION.count(stage="queue")
+        result = {"count": 1, "timings": {"decode": 0.01, "inference": 0.05, "postprocess": 0.001}}
+
+        record_upload_stages(result, 0.2)
+        record_upload_stages({"count": 1}, 0.01)  # cache hit: no stages ran
+
+        assert metrics.UPLOAD_STAGE_DURATION.count(stage="queue") == before + 1
+        assert metrics.UPLOAD_STAGE_DURATION.count(stage="inference") >= 1
@@ -0,0 +1,196 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+from backend.services.inference_backends import Detections
+from backend.services.inference_scheduler import InferenceQueueFullError
+from backend.services.model_registry import (
+    DisallowedWeightsError, ModelRegistry, UnknownQualityError, parse_model_config
+)
+
+
+class TestModelRegistry:
+    """Test cases for the multi-model registry - Requirements: FR-014, NFR-002, NFR-004"""
+    
+    @pytest.fixture
+    def registry(self, tmp_path):
+        """Create a registry with a fast and an accurate model"""
+        return ModelRegistry(
+            {"fast": "yolov8n.pt", "accurate": "yolov8s.pt"},
+            pool_type="thread",
+            max_concurrency=1,
+            weights_dir=str(tmp_path)
+        )
+    
+    @staticmethod
+    def _backend():
+        """Build a fake backend returning no detections"""
+        backend = Mock()
+        backend.predict.side_effect = lambda images, conf: [
+            Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+            for _ in images
+        ]
+        return backend
+    
+    def test_parse_model_config(self):
+        """Test the quality=path list keeps its order - FR-014"""
+        assert parse_model_config("fast=yolov8n.pt, accurate=yolov8s.pt") == {
+            "fast": "yolov8n.pt", "accurate": "yolov8s.pt"
+        }
+        with pytest.raises(ValueError):
+            parse_model_config("yolov8n.pt")
+    
+    def test_routes_by_quality(self, registry):
+        """Test each quality level has its own model and scheduler - FR-014"""
+        fast, accurate = registry.get("fast"), registry.get("accurate")
+        
+        assert fast.service.model_path == "yolov8n.pt"
+        assert accurate.service.model_path == "yolov8s.pt"
+        assert fast.scheduler is not accurate.scheduler
+        assert registry.get() is fast  # first configured model is the default
+    
+    def test_unknown_quality_rejected(self, registry):
+        """Test asking for an unconfigured quality raises - FR-014"""
+        with pytest.raises(UnknownQualityError):
+            registry.get("ultra")
+    
+    def test_per_model_concurrency_cap(self, registry):
+        """Test each model's scheduler runs at most max_concurrency batches - NFR-004"""
+        assert registry.get("fast").scheduler.max_workers == 1
+        assert registry.get("fast").scheduler.executor is registry.get("accurate").scheduler.executor
+    
+    def test_models_share_result_cache(self, registry):
+        """Test one cache serves every model, keyed by model version - NFR-002"""
+        assert registry.get("fast").service.result_cache is registry.result_cache
+        assert registry.get("accurate").service.result_cache is registry.result_cache
+    
+    @pytest.mark.asyncio
+    async def test_repeat_upload_answered_before_queueing(self, registry):
+        """Test cached uploads are answered in the API process without a queue or worker slot - NFR-002"""
+        fast = registry.get("fast")
+        fast.service._model = self._backend()
+        upload = cv2.imencode(".png", np.zeros((32, 32, 3), dtype=np.uint8))[1].tobytes()
+        
+        first = await fast.detect(upload)
+        with patch.object(fast.scheduler, 'submit', side_effect=InferenceQueueFullError("full")):
+            second = await fast.detect(upload)
+        await registry.shutdown()
+        
+        assert "timings" in first and "timings" not in second
+        assert second["count"] == first["count"]
+        assert fast.service.model.predict.call_count == 1
+        assert registry.result_cache.stats()["hits"] == 1
+        assert registry.result_cache.stats()["misses"] == 1  # the worker does not look up again
+    
+    @pytest.mark.asyncio
+    async def test_process_warm_up_reaches_every_worker(self, tmp_path):
+        """Test warm-up and swaps load the model once in each pool worker, not twice in one - NFR-002"""
+        registry = ModelRegistry(
+            {"fast": "yolov8n.pt"},
+            executor=ThreadPoolExecutor(max_workers=3),  # stands in for the process pool
+            pool_type="process",
+            workers=3,
+            weights_dir=str(tmp_path)
+        )
+        loaded = []
+        worker_service = Mock()
+        worker_service.warm_up.side_effect = lambda: loaded.append(threading.get_ident())
+        
+        with patch('backend.services.pill_detection_service._get_worker_service', return_value=worker_service):
+            await registry.warm_up()
+            assert len(set(loaded)) == 3
+            
+            loaded.clear()
+            await registry.swap("fast", "yolov8n-v2.pt")
+            assert len(set(loaded)) == 3
+        
+        await registry.shutdown()
+        registry.executor.shutdown()
+        assert registry.get("fast").service.model_path == str(tmp_path / "yolov8n-v2.pt")
+    
+    @pytest.mark.asyncio
+    async def test_warm_ups_and_swaps_run_one_at_a_time(self, tmp_path):
+        """Test a swap during warm-up waits for it instead of competing for the workers - NFR-002"""
+        registry = ModelRegistry(
+            {"fast": "yolov8n.pt", "accurate": "yolov8s.pt"},
+            # Spare threads would let warm-ups that are not serialized run side by side
+            executor=ThreadPoolExecutor(max_workers=4),
+            pool_type="process",
+            workers=2,
+            weights_dir=str(tmp_path)
+        )
+        loading, overlapping = set(), []
+        lock = threading.Lock()
+        
+        def worker_service(quality, model_path):
+            def warm_up():
+                with lock:
+                    loading.add(model_path)
+                    overlapping.append(len(loading) > 1)
+                time.sleep(0.02)
+                with lock:
+                    loading.discard(model_path)
+            return Mock(warm_up=warm_up)
+        
+        with patch('backend.services.pill_detection_service._get_worker_service', side_effect=worker_service):
+            await asyncio.gather(
+                registry.warm_up(),
+                registry.swap("fast", "yolov8n-v2.pt"),
+                registry.swap("accurate", "yolov8s-v2.pt")
+            )
+        
+        await registry.shutdown()
+        registry.executor.shutdown()
+        assert len(overlapping) == 8 and not any(overlapping)
+        assert registry.get("accurate").model_path == str(tmp_path / "yolov8s-v2.pt")
+    
+    @pytest.mark.asyncio
+    async def test_hot_swap_replaces_weights(self, registry, tmp_path):
+        """Test swapping loads and warms the new weights before serving with them - NFR-002"""
+        fast = registry.get("fast")
+        fast.service._model = self._backend()
+        new_backend = self._backend()
+        
+        with patch('backend.services.model_registry.create_backend', return_value=new_backend) as mock_create:
+            await registry.swap("fast", "yolov8n-v2.pt")
+        
+        new_path = str(tmp_path / "yolov8n-v2.pt")  # relative to the weights directory
+        mock_create.assert_called_once_with(model_path=new_path)
+        new_backend.predict.assert_called_once()  # warm-up before taking traffic
+        assert fast.service.model is new_backend
+        assert fast.model_path == new_path
+        
+        result = await fast.scheduler.submit(np.zeros((32, 32, 3), dtype=np.uint8))
+        await registry.shutdown()
+        assert result["raw_detections"] == 0
+        assert new_backend.predict.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_failed_swap_keeps_old_model(self, registry):
+        """Test weights that fail to load leave the current model serving - NFR-011"""
+        fast = registry.get("fast")
+        old_backend = self._backend()
+        fast.service._model = old_backend
+        
+        with patch('backend.services.model_registry.create_backend', side_effect=FileNotFoundError("missing")):
+            with pytest.raises(FileNotFoundError):
+                await registry.swap("fast", "missing.pt")
+        
+        assert fast.service.model is old_backend
+        assert fast.model_path == "yolov8n.pt"
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("weights_path", ["/etc/passwd", "../outside.pt", "."])
+    async def test_swap_outside_weights_dir_rejected(self, registry, weights_path):
+        """Test swaps cannot load weights from outside the weights directory - NFR-007"""
+        with patch('backend.services.model_registry.create_backend') as mock_create:
+            with pytest.raises(DisallowedWeightsError):
+                await registry.swap("fast", weights_path)
+        
+        mock_create.assert_not_called()
+        assert registry.get("fast").model_path == "yolov8n.pt"
@@ -1,10 +1,10 @@
 import pytest
 from datetime import datetime
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from unittest.mock import Mock
 
-from backend.database.models import Base, User, Patient, Supplement, Record
+from backend.database.models import Base, User, Patient, Supplement, Record, create_missing_indexes
 from backend.database.database import get_db
 
 
@@ -404,3 +404,32 @@ class TestDatabaseModels:
         assert user_dict["email"] == "test@example.com"
         assert patient_dict["name"] == "John Doe"
         assert supplement_dict["name"] == "Iron Supplement"
+
+    # NFR-002: Record queries use indexes
+    def test_record_queries_use_indexes(self, engine):
+        """Test filtering by patient and ordering by time is served by the composite index - NFR-002"""
+        with engine.connect() as connection:
+            plan = connection.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM records WHERE patient_id = 1 ORDER BY timestamp DESC"
+            )).fetchall()
+        
+        details = " ".join(row[-1] for row in plan)
+        assert "ix_records_patient_id_timestamp" in details
+        assert "TEMP B-TREE" not in details  # no separate sort step
+    
+    def test_missing_indexes_added_to_existing_database(self):
+        """Test a database created before the record indexes gets them at startup - NFR-002"""
+        engine = create_engine("sqlite:///:memory:")
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE records (id INTEGER PRIMARY KEY, patient_id INTEGER, supplement_id INTEGER, "
+                "pill_count INTEGER, source VARCHAR, confidence FLOAT, timestamp DATETIME, notes TEXT)"
+            ))
+        Base.metadata.create_all(bind=engine)
+        
+        created = create_missing_indexes(engine)
+        
+        record_indexes = {index["name"] for index in inspect(engine).get_indexes("records")}
+        assert {"ix_records_patient_id_timestamp", "ix_records_supplement_id_timestamp", "ix_records_timestamp"} <= record_indexes
+        assert "ix_records_patient_id_timestamp" in created
+        assert create_missing_indexes(engine) == []
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database.models import Base, Record
+from backend.services.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_page
+
+
+class TestPagination:
+    """Test cases for keyset pagination of records - Requirements: FR-025"""
+
+    @pytest.fixture
+    def engine(self):
+        """Create an in-memory database"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        return engine
+
+    @pytest.fixture
+    def session(self, engine):
+        """Create a session with seven records, three sharing a timestamp"""
+        session = sessionmaker(bind=engine)()
+        start = datetime(2024, 1, 1, 8, 0)
+        timestamps = [start + timedelta(minutes=minutes) for minutes in (0, 1, 2, 2, 2, 3, 4)]
+        session.add_all([
+            Record(patient_id=1, supplement_id=1, pill_count=index, source="ai", timestamp=timestamp)
+            for index, timestamp in enumerate(timestamps)
+        ])
+        session.commit()
+        yield session
+        session.close()
+
+    def test_cursor_round_trip(self):
+        """Test a cursor decodes to the timestamp and id it was made from - FR-025"""
+        timestamp = datetime(2024, 1, 1, 8, 30, 15, 123456)
+
+        assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+    @pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2024, 1, 1), 1)[:-3]])
+    def test_invalid_cursor_rejected(self, cursor):
+        """Test malformed cursors raise InvalidCursorError - FR-025"""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor)
+
+    def test_pages_cover_every_record_once_newest_first(self, session):
+        """Test following cursors returns each record once, including ties on timestamp - FR-025"""
+        query = session.query(Record)
+        seen, cursor, pages = [], None, 0
+
+        while True:
+            rows, cursor = keyset_page(query, Record.timestamp, Record.id, 2, cursor)
+            seen.extend((row.timestamp, row.id) for row in rows)
+            pages += 1
+            if cursor is None:
+                break
+
+        assert pages == 4
+        assert len(seen) == 7 and len(set(seen)) == 7
+        assert seen == sorted(seen, reverse=True)
+
+    def test_last_full_page_has_no_cursor(self, session):
+        """Test a page that ends exactly at the last record does not return a cursor - FR-025"""
+        rows, cursor = keyset_page(session.query(Record), Record.timestamp, Record.id, 7)
+
+        assert len(rows) == 7
+        assert cursor is None
@@ -5,6 +5,7 @@ import cv2
 from PIL import Image
 import io
 from backend.services.pill_detection_service import PillDetectionService
+from backend.services.inference_backends import Detections
 
 
 class TestPillDetectionService:
@@ -15,6 +16,11 @@ class TestPillDetectionService:
         """Create PillDetectionService instance for testing"""
         return PillDetectionService()
     
+    @pytest.fixture
+    def mocked_service(self):
+        """Create PillDetectionService with a mocked inference backend"""
+        return PillDetectionService(backend=Mock())
+    
     @pytest.fixture
     def mock_image(self):
         """Create a mock image for testing"""
@@ -38,13 +44,34 @@ class TestPillDetectionService:
         """Test model loading - FR-011"""
         assert pill_service.model is not None
     
-    @patch('backend.services.pill_detection_service.YOLO')
-    def test_load_model_file_not_found(self, mock_yolo, pill_service):
+    @patch('backend.services.pill_detection_service.create_backend')
+    def test_load_model_file_not_found(self, mock_create_backend, pill_service):
         """Test model loading when file doesn't exist - FR-011"""
-        mock_yolo.side_effect = FileNotFoundError("Model file not found")
+        mock_create_backend.side_effect = FileNotFoundError("Model file not found")
         
         with pytest.raises(FileNotFoundError):
-            PillDetectionService()
+            PillDetectionService().load_model()
+    
+    @patch('backend.services.pill_detection_service.create_backend')
+    def test_model_loaded_lazily(self, mock_create_backend):
+        """Test constructing the service does not load the model - NFR-001"""
+        service = PillDetectionService()
+        mock_create_backend.assert_not_called()
+        
+        service.model
+        service.model
+        mock_create_backend.assert_called_once()
+    
+    def test_warm_up_runs_dummy_inference(self):
+        """Test warm-up runs one inference and marks the service warm - NFR-002"""
+        backend = Mock()
+        service = PillDetectionService(backend)
+        
+        service.warm_up(image_size=64)
+        
+        backend.predict.assert_called_once()
+        assert backend.predict.call_args.args[0][0].shape == (64, 64, 3)
+        assert service.is_warm is True
     
     def test_preprocess_image(self, pill_service, mock_image):
         """Test image preprocessing - FR-011"""
@@ -368,3 +395,166 @@ class TestPillDetectionService:
         assert iron_count == 1
         assert vitamin_count == 1
         assert len(detections) == 2
+
+    # Batched Inference Tests (NFR-002, NFR-004)
+    @staticmethod
+    def _mock_detections(boxes):
+        """Build backend Detections from (bbox, confidence, class_id) tuples"""
+        return Detections(
+            np.array([bbox for bbox, _, _ in boxes], dtype=np.float32).reshape(-1, 4),
+            np.array([confidence for _, confidence, _ in boxes], dtype=np.float32),
+            np.array([class_id for _, _, class_id in boxes], dtype=np.int64)
+        )
+
+    def test_detect_pills_batch_single_model_call(self, mocked_service):
+        """Test batched detection runs one model call for all images - NFR-002"""
+        mocked_service.model.predict.return_value = [
+            self._mock_detections([([100, 100, 200, 200], 0.9, 0)]),
+            self._mock_detections([]),
+        ]
+
+        images = [np.zeros((640, 640, 3), dtype=np.uint8), np.zeros((480, 640, 3), dtype=np.uint8)]
+
+        with patch.object(PillDetectionService, '_simulate_pill_count', side_effect=lambda image, n: n):
+            results = mocked_service.detect_pills_batch(images)
+
+        mocked_service.model.predict.assert_called_once()
+        assert len(mocked_service.model.predict.call_args.args[0]) == 2
+        assert len(results) == 2
+        assert results[0]["count"] == 1
+        assert results[0]["bounding_boxes"][0]["bbox"] == [100.0, 100.0, 200.0, 200.0]
+        assert results[1] == {"count": 0, "confidence": 0.0, "bounding_boxes": [], "raw_detections": 0}
+
+    def test_detect_pills_batch_compact(self, mocked_service):
+        """Test compact results keep detections as parallel arrays - FR-017"""
+        mocked_service.model.predict.return_value = [
+            self._mock_detections([([100, 100, 200, 200], 0.9, 0), ([5, 5, 10, 10], 0.7, 1)])
+        ]
+
+        result = mocked_service.detect_pills_batch([np.zeros((64, 64, 3), dtype=np.uint8)], compact=True)[0]
+
+        assert result["boxes"] == [[100.0, 100.0, 200.0, 200.0], [5.0, 5.0, 10.0, 10.0]]
+        assert result["class_ids"] == [0, 1]
+        assert "bounding_boxes" not in result
+        assert PillDetectionService.expand_result(result)["bounding_boxes"][1]["class_id"] == 1
+
+    def test_detect_pills_batch_empty(self, mocked_service):
+        """Test batched detection with no images - NFR-002"""
+        assert mocked_service.detect_pills_batch([]) == []
+        mocked_service.model.predict.assert_not_called()
+
+    def test_detect_pills_batch_model_error(self, mocked_service):
+        """Test batched detection returns empty results when inference fails - NFR-011"""
+        mocked_service.model.predict.side_effect = RuntimeError("inference failed")
+
+        results = mocked_service.detect_pills_batch([np.zeros((64, 64, 3), dtype=np.uint8)] * 2)
+
+        assert [r["count"] for r in results] == [0, 0]
+
+    def test_detect_pills_batch_skips_undecodable_image(self, mocked_service):
+        """Test one corrupt upload does not fail the rest of the batch - NFR-011"""
+        mocked_service.model.predict.return_value = [self._mock_detections([([1, 1, 5, 5], 0.8, 0)])]
+
+        with patch.object(PillDetectionService, '_simulate_pill_count', side_effect=lambda image, n: n):
+            results = mocked_service.detect_pills_batch([b"not an image", np.zeros((64, 64, 3), dtype=np.uint8)])
+
+        assert len(mocked_service.model.predict.call_args.args[0]) == 1
+        assert [r["count"] for r in results] == [0, 1]
+
+    # In-memory Decode Tests (NFR-002)
+    def test_decode_image_from_bytes(self, pill_service, mock_image):
+        """Test uploads are decoded straight from memory - NFR-002"""
+        buffer = io.BytesIO()
+        mock_image.save(buffer, format='PNG')
+
+        decoded = pill_service.decode_image(buffer.getvalue())
+
+        assert decoded.shape == (640, 640, 3)
+        assert decoded.dtype == np.uint8
+
+    def test_decode_image_invalid_bytes(self, pill_service):
+        """Test undecodable bytes raise ValueError - FR-011"""
+        with pytest.raises(ValueError):
+            pill_service.decode_image(b"not an image")
+
+    # Result Cache Tests (NFR-002)
+    def test_repeated_upload_served_from_cache(self, mocked_service, mock_image):
+        """Test re-uploading identical bytes skips inference - NFR-002"""
+        buffer = io.BytesIO()
+        mock_image.save(buffer, format='PNG')
+        upload = buffer.getvalue()
+        mocked_service.result_cache.clear()
+        mocked_service.model.predict.return_value = [self._mock_detections([([1, 1, 5, 5], 0.8, 0)])]
+
+        first = mocked_service.detect_pills(upload)
+        second = mocked_service.detect_pills(upload)
+
+        assert first == second
+        mocked_service.model.predict.assert_called_once()
+        assert mocked_service.result_cache.stats()["hits"] == 1
+
+    def test_compact_results_carry_stage_timings(self, mocked_service, mock_image):
+        """Test compact results report decode/inference/postprocess time, except from the cache - NFR-002"""
+        buffer = io.BytesIO()
+        mock_image.save(buffer, format='PNG')
+        upload = buffer.getvalue()
+        mocked_service.result_cache.clear()
+        mocked_service.model.predict.return_value = [self._mock_detections([([1, 1, 5, 5], 0.8, 0)])]
+
+        first = mocked_service.detect_pills_batch([upload], compact=True)[0]
+        cached = mocked_service.detect_pills_batch([upload], compact=True)[0]
+
+        assert set(first["timings"]) == {"decode", "inference", "postprocess"}
+        assert all(seconds >= 0 for seconds in first["timings"].values())
+        assert "timings" not in cached
+
+    def test_cache_key_depends_on_threshold(self, pill_service):
+        """Test changing the confidence threshold does not reuse old results - FR-015"""
+        key = pill_service.cache_key(b"image bytes")
+        pill_service.confidence_threshold = 0.7
+
+        assert pill_service.cache_key(b"image bytes") != key
+        assert pill_service.cache_key(np.zeros((2, 2, 3), dtype=np.uint8)) is None
+
+    # Sliced Inference Tests (FR-014)
+    def test_tiled_inference_runs_tiles_in_one_batch(self, mocked_service):
+        """Test a large image is split into tiles sent through one model call - FR-014"""
+        mocked_service.tiled_inference = True
+        mocked_service.tile_size = 640
+        mocked_service.max_tiles = 16
+        mocked_service.model.predict.side_effect = lambda crops, conf: [
+            self._mock_detections([([10, 10, 30, 30], 0.9, 0)]) for _ in crops
+        ]
+        image = np.zeros((1200, 1600, 3), dtype=np.uint8)
+
+        with patch.object(PillDetectionService, '_simulate_pill_count', side_effect=lambda image, n: n):
+            result = mocked_service.detect_pills(image)
+
+        crops = mocked_service.model.predict.call_args.args[0]
+        mocked_service.model.predict.assert_called_once()
+        assert crops[0].shape == (1200, 1600, 3)  # whole-image pass
+        assert all(crop.shape[:2] == (640, 640) for crop in crops[1:])
+        assert result["raw_detections"] == len(crops) - 1  # whole-image box merges with the first tile's
+
+    def test_tiled_inference_skips_small_images(self, mocked_service):
+        """Test images that fit in one tile are not sliced - NFR-002"""
+        mocked_service.tiled_inference = True
+        mocked_service.model.predict.return_value = [self._mock_detections([])]
+
+        mocked_service.detect_pills(np.zeros((480, 640, 3), dtype=np.uint8))
+
+        assert len(mocked_service.model.predict.call_args.args[0]) == 1
+
+    # Preprocessing Tests (NFR-002)
+    def test_large_jpeg_boxes_mapped_to_original_coordinates(self, mocked_service):
+        """Test a reduced-size decode reports boxes in the uploaded image's pixels - NFR-002"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (2560, 1920), color='white').save(buffer, format='JPEG')
+        mocked_service.decode_target_size = 640
+        mocked_service.model.predict.return_value = [self._mock_detections([([10, 20, 30, 40], 0.9, 0)])]
+
+        result = mocked_service.detect_pills(buffer.getvalue())
+
+        decoded = mocked_service.model.predict.call_args.args[0][0]
+        assert decoded.shape == (960, 1280, 3)  # libjpeg 1/2 scale is the smallest that stays >= 640
+        assert result["bounding_boxes"][0]["bbox"] == [20.0, 40.0, 60.0, 80.0]
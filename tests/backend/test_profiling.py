@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.services.profiling import (
+    ContinuousProfiler, Profile, ProfileStore, ProfilingMiddleware, StackSampler
+)
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestProfiling:
+    """Test cases for on-demand and continuous profiling - Requirements: NFR-001, NFR-002"""
+
+    @pytest.fixture
+    def store(self):
+        """Create an empty profile store"""
+        return ProfileStore(max_profiles=3)
+
+    @pytest.fixture
+    def client(self, store):
+        """Create an app with a slow route behind the profiling middleware"""
+        app = FastAPI()
+        app.add_middleware(ProfilingMiddleware, store=store, token="secret")
+
+        @app.get("/slow")
+        def slow():
+            busy_wait(0.1)
+            return {"status": "done"}
+
+        return TestClient(app)
+
+    def test_sampler_sees_other_threads(self):
+        """Test the sampler records stacks of worker threads, not only the caller - NFR-001"""
+        sampler = StackSampler(interval=0.002)
+        worker = threading.Thread(target=busy_wait, args=(0.1,), name="inference-worker")
+
+        sampler.start()
+        worker.start()
+        worker.join()
+        sampler.stop()
+        samples, stacks = sampler.take()
+
+        assert samples > 0
+        assert any(stack.startswith("inference-worker;") and "busy_wait" in stack for stack in stacks)
+        assert not any(stack.startswith("profiler") for stack in stacks)
+        assert sampler.take() == (0, {})
+
+    def test_header_profiles_request(self, client, store):
+        """Test a request with the profiling token is profiled and gets its profile id - NFR-001"""
+        response = client.get("/slow", headers={"X-Profile": "secret"})
+
+        profile = store.get(response.headers["x-profile-id"])
+        assert profile.label == "GET /slow"
+        assert profile.samples > 0
+        assert "busy_wait" in profile.collapsed()
+
+    def test_requests_not_profiled_without_opt_in(self, client, store):
+        """Test a wrong token or no token leaves requests unprofiled - NFR-001"""
+        assert "x-profile-id" not in client.get("/slow", headers={"X-Profile": "wrong"}).headers
+        assert "x-profile-id" not in client.get("/slow").headers
+        assert store.list() == []
+
+    def test_armed_path_profiles_next_requests(self, client, store):
+        """Test arming a path profiles exactly that many upcoming requests - NFR-001"""
+        store.arm("/slow", 2)
+
+        responses = [client.get("/slow") for _ in range(3)]
+
+        assert ["x-profile-id" in response.headers for response in responses] == [True, True, False]
+        assert store.armed() == {}
+
+    def test_store_keeps_most_recent_profiles(self, store):
+        """Test the store drops the oldest profiles past its limit - NFR-001"""
+        for index in range(5):
+            store.add(Profile(str(index), "request", "GET /", "", 0.0, 1, {}))
+
+        assert [profile.id for profile in store.list()] == ["4", "3", "2"]
+
+    def test_continuous_profiler_stores_windows(self, store):
+        """Test the continuous profiler stores one profile per window - NFR-002"""
+        profiler = ContinuousProfiler(store, interval=0.002, window=0.05)
+
+        profiler.start()
+        busy_wait(0.12)
+        profiler.stop()
+
+        profiles = store.list()
+        assert len(profiles) >= 2
+        assert all(profile.kind == "continuous" and profile.samples > 0 for profile in profiles)
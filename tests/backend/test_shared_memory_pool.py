@@ -0,0 +1,71 @@
+import pytest
+import threading
+import numpy as np
+from unittest.mock import patch
+from multiprocessing import shared_memory
+from backend.services.shared_memory_pool import SharedMemoryProcessPoolExecutor, SharedImage, _share
+
+
+def describe_images(images, label="batch"):
+    """Runs in a worker process: report what each image arrived as"""
+    return label, [
+        (type(image).__name__, len(image) if isinstance(image, bytes) else int(image.sum()))
+        for image in images
+    ]
+
+
+class TestSharedMemoryPool:
+    """Test cases for shared-memory image transfer to process workers - Requirements: NFR-002, NFR-004"""
+    
+    @pytest.fixture
+    def executor(self):
+        """Create a two-worker pool that shares anything over 1 KB"""
+        executor = SharedMemoryProcessPoolExecutor(max_workers=2, min_bytes=1024)
+        yield executor
+        executor.shutdown()
+    
+    def test_images_round_trip_through_workers(self, executor):
+        """Test arrays and upload bytes reach the worker intact - NFR-004"""
+        array = np.ones((64, 64, 3), dtype=np.uint8)
+        upload = b"\xff" * 4096
+        
+        label, described = executor.submit(describe_images, [array, upload, b"tiny"], label="x").result()
+        
+        assert label == "x"
+        assert described == [("ndarray", 64 * 64 * 3), ("bytes", 4096), ("bytes", 4)]
+    
+    def test_large_images_replaced_by_references(self):
+        """Test only decoded images above the threshold are moved to shared memory - NFR-002"""
+        blocks = []
+        small = _share(np.zeros((4, 4, 3), dtype=np.uint8), blocks, min_bytes=1024)
+        upload = _share(b"\xff" * 4096, blocks, min_bytes=1024)
+        large = _share(np.zeros((32, 32, 3), dtype=np.uint8), blocks, min_bytes=1024)
+        
+        assert isinstance(small, np.ndarray)
+        assert upload == b"\xff" * 4096
+        assert isinstance(large, SharedImage) and large.shape == (32, 32, 3)
+        assert len(blocks) == 1
+        for block in blocks:
+            block.close()
+            block.unlink()
+    
+    def test_blocks_released_after_call(self, executor):
+        """Test shared memory is unlinked once the worker finishes - NFR-002"""
+        created = []
+        original = shared_memory.SharedMemory
+        
+        def tracking(*args, **kwargs):
+            block = original(*args, **kwargs)
+            created.append(block.name)
+            return block
+        
+        with patch.object(shared_memory, 'SharedMemory', side_effect=tracking):
+            future = executor.submit(describe_images, [np.ones((64, 64, 3), dtype=np.uint8)])
+        # Callbacks run in order, so this one fires after the pool has released the block
+        released = threading.Event()
+        future.add_done_callback(lambda _: released.set())
+        
+        assert released.wait(timeout=10)
+        assert len(created) == 1
+        with pytest.raises(FileNotFoundError):
+            original(name=created[0])
@@ -0,0 +1,83 @@
+import pytest
+import json
+import logging
+import cv2
+from unittest.mock import patch
+from backend.services import thread_tuning
+from backend.services.thread_tuning import (
+    ThreadSettings, apply_thread_settings, autotune_thread_settings, candidate_settings,
+    default_thread_settings, resolve_thread_settings
+)
+
+
+class TestThreadTuning:
+    """Test cases for inference thread configuration - Requirements: NFR-002, NFR-004"""
+    
+    def test_default_settings_split_cpu_budget(self):
+        """Test workers share the cores instead of each using all of them - NFR-004"""
+        with patch.object(thread_tuning, 'cpu_budget', return_value=8):
+            settings = default_thread_settings(workers=4)
+        
+        assert settings.workers == 4
+        assert settings.intra_op_threads == 2
+    
+    def test_cpu_budget_divided_between_uvicorn_workers(self, monkeypatch):
+        """Test each uvicorn process only plans for its share of the machine - NFR-004"""
+        monkeypatch.setenv("WEB_CONCURRENCY", "2")
+        with patch('os.sched_getaffinity', return_value=set(range(8))):
+            assert thread_tuning.cpu_budget() == 4
+    
+    def test_candidate_settings_cover_budget(self):
+        """Test candidates never use more threads than the budget - NFR-004"""
+        candidates = candidate_settings(6)
+        
+        assert [c.workers for c in candidates] == [1, 2, 4, 6]
+        assert all(c.workers * c.intra_op_threads <= 6 for c in candidates)
+    
+    def test_apply_sets_opencv_threads(self):
+        """Test OpenCV's thread pool follows the settings - NFR-004"""
+        previous = cv2.getNumThreads()
+        try:
+            apply_thread_settings(ThreadSettings(1, 2, 1, 3))
+            assert cv2.getNumThreads() == 3
+            assert thread_tuning.current_thread_settings().intra_op_threads == 2
+        finally:
+            cv2.setNumThreads(previous)
+    
+    def test_autotune_picks_fastest(self, caplog):
+        """Test the tuner keeps the candidate with the highest throughput - NFR-002"""
+        candidates = [ThreadSettings(1, 4, 1, 1), ThreadSettings(2, 2, 1, 1), ThreadSettings(4, 1, 1, 1)]
+        throughput = {1: 10.0, 2: 25.0, 4: 18.0}
+        
+        with patch.object(thread_tuning, '_measure_throughput',
+                          side_effect=lambda settings, *args: throughput[settings.workers]), \
+                caplog.at_level(logging.INFO, logger=thread_tuning.__name__):
+            best = autotune_thread_settings("thread", "yolov8n.pt", candidates, trial_images=2)
+        
+        assert best == candidates[1]
+        assert len(caplog.records) == 3
+    
+    def test_tuning_result_reused(self, tmp_path):
+        """Test tuned settings are stored and reused on the next start - NFR-001"""
+        tuning_file = tmp_path / "tuning.json"
+        tuned = ThreadSettings(2, 2, 1, 1)
+        
+        with patch.object(thread_tuning, 'INFERENCE_AUTOTUNE', True), \
+                patch.object(thread_tuning, 'INFERENCE_TUNING_FILE', str(tuning_file)), \
+                patch.object(thread_tuning, 'autotune_thread_settings', return_value=tuned) as mock_tune:
+            first = resolve_thread_settings("thread", 1, "yolov8n.pt")
+            second = resolve_thread_settings("thread", 1, "yolov8n.pt")
+        
+        assert first == second == tuned
+        mock_tune.assert_called_once()
+        assert list(json.loads(tuning_file.read_text()).values()) == [tuned._asdict()]
+    
+    def test_pool_workers_do_not_autotune(self):
+        """Test a worker process re-importing the API uses configured settings instead of tuning - NFR-004"""
+        with patch.object(thread_tuning, 'INFERENCE_AUTOTUNE', True), \
+                patch('multiprocessing.parent_process', return_value=object()), \
+                patch.object(thread_tuning, 'autotune_thread_settings') as mock_tune:
+            settings = resolve_thread_settings("process", 2, "yolov8n.pt")
+        
+        mock_tune.assert_not_called()
+        assert settings.workers == 2
@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+from backend.services.inference_backends import Detections
+from backend.services.tiling import compute_tiles, merge_detections
+
+
+class TestTiling:
+    """Test cases for sliced inference helpers - Requirements: FR-014, NFR-002"""
+    
+    def test_tiles_cover_image_with_overlap(self):
+        """Test tiles cover the full image and overlap their neighbours - FR-014"""
+        tiles = compute_tiles(1000, 1500, tile_size=640, overlap=0.2, max_tiles=16)
+        
+        assert min(x1 for x1, _, _, _ in tiles) == 0
+        assert max(x2 for _, _, x2, _ in tiles) == 1500
+        assert max(y2 for _, _, _, y2 in tiles) == 1000
+        assert all(x2 - x1 == 640 and y2 - y1 == 640 for x1, y1, x2, y2 in tiles)
+        assert tiles[1][0] < tiles[0][2]  # second tile starts inside the first
+    
+    def test_small_image_single_tile(self):
+        """Test an image smaller than a tile is not split - NFR-002"""
+        assert compute_tiles(480, 640, tile_size=640, overlap=0.2, max_tiles=16) == [(0, 0, 640, 480)]
+    
+    def test_max_tiles_caps_grid(self):
+        """Test very large images use bigger tiles rather than exceeding max_tiles - NFR-002"""
+        tiles = compute_tiles(4000, 4000, tile_size=640, overlap=0.2, max_tiles=4)
+        
+        assert len(tiles) <= 4
+        assert max(x2 for _, _, x2, _ in tiles) == 4000
+    
+    @pytest.mark.parametrize("overlap, max_tiles", [(1.0, 16), (1.5, 16), (-0.1, 16), (0.2, 0), (0.2, -1)])
+    def test_invalid_tiling_settings_rejected(self, overlap, max_tiles):
+        """Test settings that would never finish tiling raise instead of looping - FR-014"""
+        with pytest.raises(ValueError):
+            compute_tiles(1000, 1500, tile_size=640, overlap=overlap, max_tiles=max_tiles)
+    
+    def test_merge_suppresses_cross_tile_duplicates(self):
+        """Test an object seen by two overlapping tiles is counted once - FR-014"""
+        left = Detections(np.array([[500, 100, 560, 160]], dtype=np.float32), np.array([0.9], dtype=np.float32), np.array([0]))
+        # Same object, cut by the right tile's edge and seen in its local coordinates
+        right = Detections(np.array([[0, 100, 48, 160]], dtype=np.float32), np.array([0.7], dtype=np.float32), np.array([0]))
+        other = Detections(np.array([[300, 300, 340, 340]], dtype=np.float32), np.array([0.8], dtype=np.float32), np.array([0]))
+        
+        merged = merge_detections([left, right, other], [(0, 0), (512, 0), (512, 0)])
+        
+        assert len(merged.confidences) == 2
+        np.testing.assert_allclose(merged.boxes[0], [500, 100, 560, 160])
+        np.testing.assert_allclose(merged.boxes[1], [812, 300, 852, 340])